@@ -22,6 +22,26 @@ def decode(east_output: dai.NNData) -> np.ndarray:
         Array of tuples ``(RRect, confidence)``
     """
     coded_scores, coded_bboxes, coded_angles = (np.array(east_output.getLayerFp16(tensor.name)) for tensor in east_output.getRaw().tensors)
+    return decode_tensors(coded_scores, coded_bboxes, coded_angles)
+
+
+def decode_tensors(coded_scores: np.ndarray, coded_bboxes: np.ndarray, coded_angles: np.ndarray) -> np.ndarray:
+    """Decodes raw east output tensors into array of tuples ``(RRect, confidence)``
+
+    Parameters
+    ----------
+    coded_scores : np.ndarray
+        Score map, 64x64 values
+    coded_bboxes : np.ndarray
+        Distances to box edges, 4x64x64 values
+    coded_angles : np.ndarray
+        Angle map, 64x64 values
+
+    Returns
+    -------
+    np.ndarray
+        Array of tuples ``(RRect, confidence)``
+    """
     coded_scores = coded_scores.reshape(64, 64)
     coded_bboxes = coded_bboxes.reshape(4, 64, 64).transpose(1, 2, 0)
     coded_angles = coded_angles.reshape(64, 64)
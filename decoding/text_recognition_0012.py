@@ -6,9 +6,8 @@ import depthai as dai
 _chars_map: list = list('0123456789abcdefghijklmnopqrstuvwxyz#')
 
 
-def decode(tr12_output: dai.NNData) -> np.ndarray:
-	coded_texts = np.array(tr12_output.getFirstLayerFp16()).reshape(30, 1, 37)
-
+def decode_logits(coded_texts: np.ndarray) -> list:
+	"""Greedy decoding of raw network output of shape ``(30, batch, 37)`` into one text per batch item"""
 	texts: list = []
 	index: int = 0
 	# Select max probabilty (greedy decoding) then decode index to character
@@ -27,4 +26,15 @@ def decode(tr12_output: dai.NNData) -> np.ndarray:
 		texts.append(''.join([_chars_map[t[i]] for i in range(l) if _chars_map[t[i]] != '#' and not (i > 0 and t[i - 1] == t[i])]))
 		index += l
 
-	return texts[0]
+	return texts
+
+
+def decode(tr12_output: dai.NNData) -> str:
+	coded_texts = np.array(tr12_output.getFirstLayerFp16()).reshape(30, 1, 37)
+	return decode_logits(coded_texts)[0]
+
+
+def decode_batch(tr12_output: dai.NNData, batch_size: int) -> list:
+	"""Decodes output of a recognition network compiled for ``batch_size`` crops, one text per crop"""
+	coded_texts = np.array(tr12_output.getFirstLayerFp16()).reshape(30, batch_size, 37)
+	return decode_logits(coded_texts)
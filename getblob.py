@@ -1,6 +1,58 @@
+import argparse
+import shutil
+import tempfile
+import zipfile
+from pathlib import Path
+
 import blobconverter
-with open('sciezka_do_blobow.txt', 'w') as f:
-	f.write(f'EAST detection: {blobconverter.from_zoo(name='east_text_detection_256x256', zoo_type='depthai', shaves=6, version='2021.2')}\n')
-	f.write(f'Recognition: {blobconverter.from_zoo(name='text-recognition-0012', shaves=6, version='2021.2')}')
+from utils.settings import Mosaic
+
+
+def batch_recognition_blob(batch_size: int, models_dir: Path = Path('models')) -> Path:
+	"""Compiles text-recognition-0012 for ``batch_size`` crops, as used by ``main.py --mosaic``
+
+	Downloads the OpenVINO IR from the zoo, reshapes its batch dimension with the
+	``openvino`` package (pinned in requirements.txt, also used by utils/cpu_backend.py) and
+	compiles the result with blobconverter into ``models/text-recognition-0012_batch{batch_size}.blob``.
+	"""
+	import openvino as ov
+
+	with tempfile.TemporaryDirectory() as tmp:
+		tmp = Path(tmp)
+		ir_zip = blobconverter.from_zoo(name='text-recognition-0012', shaves=6, version='2022.1', download_ir=True, output_dir=tmp)
+		with zipfile.ZipFile(ir_zip) as z:
+			z.extractall(tmp / 'ir')
+		xml = next((tmp / 'ir').rglob('*.xml'))
+
+		model = ov.Core().read_model(str(xml))
+		shape = list(model.input().shape)
+		shape[0] = batch_size
+		model.reshape(shape)
+		print(f'Recognition input reshaped to {shape}')
+		crop_w, crop_h = Mosaic.CROP_SIZE
+		if shape[1:] != [Mosaic.CHANNELS, crop_h, crop_w]:
+			raise ValueError(f'utils/mosaic.py packs crops as [{Mosaic.CHANNELS}, {crop_h}, {crop_w}] (Mosaic.CHANNELS, Mosaic.CROP_SIZE), the network expects {shape[1:]}')
+
+		ov.serialize(model, str(tmp / 'batch.xml'), str(tmp / 'batch.bin'))
+		blob = blobconverter.from_openvino(xml=str(tmp / 'batch.xml'), bin=str(tmp / 'batch.bin'),
+		                                   data_type='FP16', shaves=6, version='2022.1', output_dir=tmp)
+
+		models_dir.mkdir(exist_ok=True)
+		target = models_dir / f'text-recognition-0012_batch{batch_size}.blob'
+		shutil.copy(blob, target)
+	return target
+
+
+if __name__ == '__main__':
+	parser = argparse.ArgumentParser(prog='getblob')
+	parser.add_argument('--batch', type=int, default=0, help=f'Also compile the batch recognition blob for --mosaic (e.g. {Mosaic.BATCH_SIZE})')
+	args = parser.parse_args()
+
+	with open('sciezka_do_blobow.txt', 'w') as f:
+		f.write(f"EAST detection: {blobconverter.from_zoo(name='east_text_detection_256x256', zoo_type='depthai', shaves=6, version='2021.2')}\n")
+		f.write(f"Recognition: {blobconverter.from_zoo(name='text-recognition-0012', shaves=6, version='2021.2')}")
+		if args.batch > 0:
+			f.write(f"\nBatch recognition: {batch_recognition_blob(args.batch)}")
 
-# ten skrypt pobiera pliki .blob. z utowrzonego pliku 'sciezka_do_blobów.txt' trzeba skopiować ścieżki do plików a same pliki skopiować do folderu models
\ No newline at end of file
+# ten skrypt pobiera pliki .blob. z utowrzonego pliku 'sciezka_do_blobów.txt' trzeba skopiować ścieżki do plików a same pliki skopiować do folderu models
+# z opcją --batch N dodatkowo kompiluje sieć rozpoznawania dla N wycinków (main.py --mosaic, N = Mosaic.BATCH_SIZE) i zapisuje ją od razu w models/
@@ -0,0 +1,63 @@
+import argparse
+import json
+import sys
+from pathlib import Path
+
+import utils.harness as harness
+from utils.settings import Regression
+import utils.Logger as Logger
+
+
+logger = Logger.Logger()
+
+def parse_args():
+    parser = argparse.ArgumentParser(prog='Gerwazy regression', description='Replay a recorded corpus through the host path and check accuracy and throughput')
+
+    parser.add_argument('-c', '--corpus', type=Path, default=Regression.CORPUS, help='Corpus directory with manifest.json, recorded with main.py --record')
+    parser.add_argument('-b', '--baseline', type=Path, default=Regression.BASELINE, help='Baseline report to compare against')
+    parser.add_argument('--update-baseline', action='store_true', help='Write this run as the new baseline instead of comparing')
+    parser.add_argument('-r', '--repeat', type=int, default=Regression.REPEAT, help='Passes over the corpus')
+    parser.add_argument('--min-char-accuracy', type=float, default=Regression.MIN_CHAR_ACCURACY)
+    parser.add_argument('--min-word-accuracy', type=float, default=Regression.MIN_WORD_ACCURACY)
+    parser.add_argument('--accuracy-tolerance', type=float, default=Regression.ACCURACY_TOLERANCE)
+    parser.add_argument('--throughput-tolerance', type=float, default=Regression.THROUGHPUT_TOLERANCE)
+    parser.add_argument('-v', '--verbose', action='store_true', help='Print additional info to the console')
+
+    return parser.parse_args()
+
+
+def main(args) -> int:
+    logger(f'Loading corpus {args.corpus}...')
+    try:
+        corpus = harness.load_corpus(args.corpus)
+    except (FileNotFoundError, ValueError) as e:
+        print(f'ERROR: {e}', file=sys.stderr)
+        return 2
+    logger(f'{len(corpus)} frames loaded\n')
+
+    report: harness.RegressionReport = harness.run(corpus, repeat=args.repeat)
+    print(json.dumps(report.to_dict(), indent=2))
+
+    if args.update_baseline:
+        args.baseline.write_text(json.dumps(report.to_dict(), indent=2))
+        logger(f'Baseline written to {args.baseline}')
+        return 0
+
+    baseline = json.loads(args.baseline.read_text()) if args.baseline.exists() else None
+    if baseline is None:
+        logger(f'No baseline at {args.baseline}, checking absolute thresholds only')
+    elif not report.same_host(baseline):
+        print(f'Baseline {args.baseline} was measured on another host, throughput and latency are not compared')
+
+    failures = report.check(baseline, args.min_char_accuracy, args.min_word_accuracy,
+                            args.accuracy_tolerance, args.throughput_tolerance)
+    for failure in failures:
+        print(f'REGRESSION: {failure}')
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    args = parse_args()
+    logger.set_logging(args.verbose)
+
+    sys.exit(main(args))
@@ -0,0 +1,47 @@
+import numpy as np
+import pytest
+
+from utils.cpu_backend import CpuPipeline, split_east_outputs
+
+
+def _maps():
+    scores = np.zeros((1, 1, 64, 64), dtype=np.float32)
+    scores[0, 0, 10, 10] = 0.9
+    bboxes = np.full((1, 4, 64, 64), 5, dtype=np.float32)
+    angles = np.full((1, 1, 64, 64), 0.25, dtype=np.float32)
+    return scores, bboxes, angles
+
+
+@pytest.mark.parametrize('order', [(0, 1, 2), (2, 1, 0), (1, 2, 0)])
+def test_three_outputs_selected_by_name_and_shape(order):
+    scores, bboxes, angles = _maps()
+    named = [('feature_fusion/Conv_7/Sigmoid', scores), ('feature_fusion/mul_6', bboxes), ('feature_fusion/sub/Fused_Add_', angles)]
+    outputs = dict(named[i] for i in order)
+
+    got_scores, got_bboxes, got_angles = split_east_outputs(outputs)
+
+    assert got_scores is scores
+    assert got_bboxes.shape == (4, 64, 64)
+    assert got_angles is angles
+
+
+def test_original_east_geometry_with_angle_channel():
+    scores, bboxes, angles = _maps()
+    geometry = np.concatenate([bboxes, angles], axis=1)
+
+    got_scores, got_bboxes, got_angles = split_east_outputs({'feature_fusion/concat_3': geometry, 'feature_fusion/Conv_7/Sigmoid': scores})
+
+    assert got_scores is scores
+    np.testing.assert_array_equal(got_bboxes, bboxes[0])
+    np.testing.assert_array_equal(got_angles, angles[0, 0])
+
+
+def test_ambiguous_single_channel_outputs_raise():
+    scores, bboxes, angles = _maps()
+    with pytest.raises(ValueError):
+        split_east_outputs({'a': scores, 'b': bboxes, 'c': angles})
+
+
+def test_non_ir_recognition_model_is_rejected():
+    with pytest.raises(ValueError, match='OpenVINO IR'):
+        CpuPipeline(recognition_model='models/text-recognition-0012.onnx')
@@ -0,0 +1,55 @@
+import numpy as np
+import pytest
+
+from utils.gating import FrameGate, device_script, replay
+
+
+def _frames(n: int, changed: set[int] = frozenset()) -> list[np.ndarray]:
+    frames = []
+    for i in range(n):
+        frame = np.zeros((256, 256, 3), dtype=np.uint8)
+        if i in changed:
+            frame[:] = 200
+        frames.append(frame)
+    return frames
+
+
+def test_idle_scene_is_detected_at_floor_rate():
+    gate = FrameGate(min_fps=0.5)
+    decisions = replay(gate, _frames(50), [i / 10 for i in range(50)], [0] * 50)
+    # 10 fps camera, 0.5 fps floor -> every 20th frame
+    assert [i for i, d in enumerate(decisions) if d] == [0, 20, 40]
+
+
+def test_motion_passes_frame():
+    gate = FrameGate(min_fps=0.5)
+    decisions = replay(gate, _frames(10, changed={5}), [i / 10 for i in range(10)], [0] * 10)
+    # the change and the return to the old scene both differ from the last detected frame
+    assert [i for i, d in enumerate(decisions) if d] == [0, 5, 6]
+
+
+def test_hold_after_detection():
+    gate = FrameGate(min_fps=0.5, hold_frames=3)
+    detections = [1] + [0] * 9
+    decisions = replay(gate, _frames(10), [i / 10 for i in range(10)], detections)
+    # detection in frame 0 keeps full rate for 3 more detected frames without text
+    assert [i for i, d in enumerate(decisions) if d] == [0, 1, 2, 3]
+
+
+def test_max_fps_caps_rate():
+    gate = FrameGate(min_fps=0.5, hold_frames=100, max_fps=4)
+    decisions = replay(gate, _frames(20), [i / 16 for i in range(20)], [1] * 20)
+    assert [i for i, d in enumerate(decisions) if d] == [0, 4, 8, 12, 16]
+    assert gate.effective_fps == pytest.approx(4)
+
+
+def test_pass_history_is_bounded():
+    gate = FrameGate(min_fps=1, hold_frames=10**6)
+    replay(gate, _frames(1) * 1000, [i / 30 for i in range(1000)], [1] * 1000)
+    assert gate.frames_passed == 1000
+    # only the last 2 s window (2 / min_fps) of a 30 fps stream is kept
+    assert len(gate._passes) <= 61
+
+
+def test_device_script_compiles():
+    compile(device_script(FrameGate(max_fps=10)), 'gate_script', 'exec')
@@ -0,0 +1,75 @@
+import json
+
+import numpy as np
+import pytest
+
+from utils.harness import CorpusRecorder, FakeQueues, RegressionReport, load_corpus, recognition_output, run, save_frame
+from utils.mosaic import CropMosaic
+from utils.results import HostStages
+
+
+def _record(texts: list[str]) -> dict[str, np.ndarray]:
+    # one 104x16 box per text, 16 rows apart
+    scores = np.zeros((64, 64), dtype=np.float32)
+    geometry = np.zeros((4, 64, 64), dtype=np.float32)
+    for i in range(len(texts)):
+        scores[10 + 4 * i, 10] = 0.9
+        geometry[:, 10 + 4 * i, 10] = [4, 100, 12, 4]
+    return {'frame': np.full((256, 256, 3), 127, dtype=np.uint8),
+            'scores': scores, 'geometry': geometry, 'angles': np.zeros((64, 64), dtype=np.float32),
+            'recognition': np.array([recognition_output(text) for text in texts], dtype=np.float32).reshape(-1, 30, 37)}
+
+
+def _save(path, index: int, texts: list[str], truth: list[str]) -> None:
+    record = _record(texts)
+    save_frame(path, index, record['frame'], record['scores'], record['geometry'], record['angles'], list(record['recognition']), truth)
+
+
+def test_synthetic_corpus_replays(tmp_path):
+    _save(tmp_path, 0, ['ab12'], ['ab12'])
+    _save(tmp_path, 1, ['xy', 'z9'], ['xy', 'z8'])
+
+    report = run(load_corpus(tmp_path), batch_size=2, repeat=1)
+    assert report.frames == 2
+    assert report.crops == 3
+    assert report.char_accuracy == pytest.approx(7 / 8)
+    assert report.word_accuracy == pytest.approx(2 / 3)
+
+
+def test_save_frame_replaces_index(tmp_path):
+    _save(tmp_path, 0, ['ab'], ['ab'])
+    _save(tmp_path, 0, ['ab'], ['cd'])
+    manifest = json.loads((tmp_path / 'manifest.json').read_text())
+    assert manifest['frames'] == [{'file': '000000.npz', 'truth': ['cd']}]
+
+
+def test_missing_corpus_is_reported(tmp_path):
+    with pytest.raises(FileNotFoundError, match='--record'):
+        load_corpus(tmp_path / 'v1')
+
+
+def test_recorder_writes_replayable_corpus(tmp_path):
+    source = _record(['ab', 'cd'])
+    for _ in range(2):
+        recorder = CorpusRecorder(tmp_path)
+        stages = HostStages(mosaic=CropMosaic(batch_size=2), recorder=recorder)
+        q = FakeQueues(batch_size=2)
+        q.push(source, 1, 0.0)
+        [result] = stages.step(q)
+        assert result.texts == ['ab', 'cd']
+
+    corpus = load_corpus(tmp_path)
+    assert len(corpus) == 2
+    record, truth = corpus[1]
+    assert truth == ['ab', 'cd']
+    for key in ('frame', 'recognition'):
+        np.testing.assert_array_equal(record[key], source[key])
+    np.testing.assert_allclose(record['geometry'].reshape(4, 64, 64), source['geometry'])
+
+
+def test_throughput_compared_on_same_host_only():
+    report = RegressionReport(fps=10.0, crops_per_s=10.0, char_accuracy=1.0, word_accuracy=1.0)
+    baseline = report.to_dict() | {'fps': 100.0}
+    assert report.check(baseline) != []
+    assert report.check(baseline | {'host': {'machine': 'elsewhere'}}) == []
+    assert report.check(baseline | {'char_accuracy': 1.5, 'host': {}}) != []
@@ -0,0 +1,54 @@
+import cv2
+import depthai as dai
+import numpy as np
+
+from utils.geometry import RRect
+from utils.mosaic import CropMosaic
+
+
+def test_axis_aligned_box_crops_exactly():
+    frame = np.zeros((256, 256, 3), dtype=np.uint8)
+    # 120x32 box covering rows 100-131 and columns 50-169
+    frame[100:132, 50:170] = np.arange(32, dtype=np.uint8)[:, None, None] + 100
+    mosaic = CropMosaic(batch_size=2)
+
+    assert mosaic.pack(frame, [RRect((50, 100), (170, 132), 0.0)]) == 1
+
+    crop = mosaic.planar[0].transpose(1, 2, 0)
+    np.testing.assert_array_equal(crop[:, :, 0], frame[100:132, 50:170, 0])
+    assert not mosaic.planar[1].any()
+
+
+def test_batches_cover_all_boxes():
+    frame = np.full((256, 256, 3), 50, dtype=np.uint8)
+    rects = [RRect((10, 10), (130, 42), 0.1) for _ in range(5)]
+    mosaic = CropMosaic(batch_size=2)
+    assert list(mosaic.batches(frame, rects)) == [2, 2, 1]
+
+
+def test_packed_bytes_are_one_plane_per_crop():
+    frame = np.zeros((256, 256, 3), dtype=np.uint8)
+    frame[0:32, 0:120] = (10, 20, 30)
+    frame[100:132, 0:120] = (200, 100, 50)
+    rects = [RRect((0, 0), (120, 32), 0.0), RRect((0, 100), (120, 132), 0.0)]
+    mosaic = CropMosaic(batch_size=3)
+    mosaic.pack(frame, rects)
+
+    img_frame = mosaic.to_imgframe()
+    assert img_frame.getType() == dai.ImgFrame.Type.GRAY8
+    assert (img_frame.getWidth(), img_frame.getHeight()) == (120, 3 * 32)
+
+    # [N, 1, 32, 120]: crop i is bytes i*32*120 ... (i+1)*32*120, luminance of its box
+    data = np.asarray(img_frame.getData()).reshape(3, 32 * 120)
+    expected = [cv2.cvtColor(frame[0:1, 0:1], cv2.COLOR_BGR2GRAY)[0, 0], cv2.cvtColor(frame[100:101, 0:1], cv2.COLOR_BGR2GRAY)[0, 0], 0]
+    for crop, value in zip(data, expected):
+        assert (crop == value).all()
+
+
+def test_bgr_network_keeps_planes():
+    frame = np.zeros((256, 256, 3), dtype=np.uint8)
+    frame[0:32, 0:120] = (10, 20, 30)
+    mosaic = CropMosaic(batch_size=1, channels=3)
+    mosaic.pack(frame, [RRect((0, 0), (120, 32), 0.0)])
+    assert [int(plane[0, 0]) for plane in mosaic.planar[0]] == [10, 20, 30]
+    assert mosaic.to_imgframe().getType() == dai.ImgFrame.Type.BGR888p
@@ -0,0 +1,99 @@
+import time
+
+import numpy as np
+import pytest
+
+import utils.results as results
+from utils.geometry import RRect
+from utils.harness import FakeImgFrame, FakeNNData, FakeQueues, recognition_output
+from utils.results import HostStages, open_stream
+
+
+def _push_frame(q: FakeQueues, sequence_num: int) -> None:
+    layers = {'scores': np.zeros(1), 'geometry': np.zeros(1), 'angles': np.zeros(1)}
+    q.detnn_out.put(FakeNNData(layers, sequence_num, float(sequence_num)))
+    q.detnn_pass.put(FakeImgFrame(np.zeros((256, 256, 3), dtype=np.uint8), sequence_num))
+
+
+@pytest.fixture
+def detections(monkeypatch):
+    boxes = [(RRect((10, 10), (130, 42), 0.0), 0.9), (RRect((10, 60), (130, 92), 0.0), 0.8)]
+    monkeypatch.setattr(results.east, 'decode', lambda _: boxes)
+    return boxes
+
+
+def test_manip_texts_are_paired_by_sequence_number(detections):
+    stages = HostStages()
+    q = FakeQueues(batch_size=1)
+    _push_frame(q, 1)
+    _push_frame(q, 2)
+
+    # crops are sent, nothing is waited for
+    assert stages.step(q) == []
+    assert q.manip_cfg.sent == 4
+
+    q.recnn_out.put(FakeNNData({'out': recognition_output('ab')}, 1))
+    q.recnn_out.put(FakeNNData({'out': recognition_output('cd')}, 2))
+    q.recnn_out.put(FakeNNData({'out': recognition_output('ef')}, 1))
+    q.recnn_out.put(FakeNNData({'out': recognition_output('gh')}, 2))
+    done = stages.step(q)
+
+    assert [(r.sequence_num, r.texts, r.recognition_failed) for r in done] == [(1, ['ab', 'ef'], False), (2, ['cd', 'gh'], False)]
+
+
+def test_manip_frame_with_missing_output_fails_whole(detections, monkeypatch):
+    monkeypatch.setattr(results.Results, 'RECOGNITION_TIMEOUT', 0.05)
+    stages = HostStages()
+    q = FakeQueues(batch_size=1)
+    _push_frame(q, 1)
+    assert stages.step(q) == []
+
+    q.recnn_out.put(FakeNNData({'out': recognition_output('ab')}, 1))
+    time.sleep(0.06)
+    done = stages.step(q)
+
+    assert len(done) == 1
+    assert done[0].recognition_failed
+    assert done[0].texts == ['', '']
+    assert stages.recognition_timeouts == 1
+
+
+def test_mosaic_skips_outputs_of_other_batches(detections):
+    stages = HostStages(mosaic=results.CropMosaic(batch_size=2))
+    q = FakeQueues(batch_size=2)
+    # late output of an earlier batch is queued before the answer
+    q.recnn_batch_out.put(FakeNNData({'output': np.zeros((30, 2, 37), dtype=np.float32)}, 0))
+    q._recognition.extend([recognition_output('ab'), recognition_output('cd')])
+    _push_frame(q, 1)
+
+    [result] = stages.step(q)
+    assert result.texts == ['ab', 'cd']
+    assert not result.recognition_failed
+
+
+def test_cpu_stream_rejects_device_options():
+    with pytest.raises(ValueError):
+        open_stream(cpu=True, gate=True)
+    with pytest.raises(ValueError):
+        open_stream(cpu=True, mosaic=True)
+
+
+def test_unmatched_counts_reach_results(detections):
+    stages = HostStages(mosaic=results.CropMosaic(batch_size=2))
+    q = FakeQueues(batch_size=2)
+    q.detnn_out.put(FakeNNData({'scores': np.zeros(1), 'geometry': np.zeros(1), 'angles': np.zeros(1)}, 1, 1.0))
+    q._recognition.extend([recognition_output('ab'), recognition_output('cd')])
+    _push_frame(q, 2)
+
+    [result] = stages.step(q)
+    assert result.sequence_num == 2
+    assert (result.unmatched_detections, result.unmatched_frames) == (1, 0)
+
+
+def test_timings_keys_match_cpu_backend(detections):
+    stages = HostStages(mosaic=results.CropMosaic(batch_size=2))
+    q = FakeQueues(batch_size=2)
+    q._recognition.extend([recognition_output('ab'), recognition_output('cd')])
+    _push_frame(q, 1)
+    [result] = stages.step(q)
+    assert set(result.timings) == {'detection', 'recognition', 'total'}
@@ -0,0 +1,259 @@
+from itertools import islice
+
+import numpy as np
+import pytest
+
+import utils.results as results
+from utils.geometry import RRect
+from utils.harness import FakeImgFrame, FakeNNData, FakeQueue
+from utils.results import HostStages
+from utils.session import DeviceSession
+from utils.settings import Session
+
+_XLINK_ERROR = "Communication exception - possible device error/misconfiguration. Original message 'Couldn't read data from stream: 'detnn_out' (X_LINK_ERROR)'"
+
+
+class _Speed:
+    name = 'SUPER'
+
+
+class _DeviceQueue(FakeQueue):
+    """Queue of a FakeDevice, reads fail like XLink once the device is gone"""
+    def __init__(self, device: 'FakeDevice') -> None:
+        super().__init__()
+        self._device: FakeDevice = device
+
+    def tryGetAll(self) -> list:
+        if self._device.closed:
+            raise RuntimeError(_XLINK_ERROR)
+        return super().tryGetAll()
+
+
+class FakeDevice:
+    """Stand-in for ``dai.Device``, ``disconnect()`` pulls the cable"""
+    def __init__(self, pipeline=None) -> None:
+        self.closed: bool = False
+        self.queues: dict[str, _DeviceQueue] = {}
+
+    def queue(self, name: str) -> _DeviceQueue:
+        return self.queues.setdefault(name, _DeviceQueue(self))
+
+    def getInputQueue(self, name: str, *args, **kwargs) -> _DeviceQueue:
+        return self.queue(name)
+
+    def getOutputQueue(self, name: str, *args, **kwargs) -> _DeviceQueue:
+        return self.queue(name)
+
+    def getInputQueueNames(self) -> list[str]:
+        return []
+
+    def getOutputQueueNames(self) -> list[str]:
+        return []
+
+    def getUsbSpeed(self) -> _Speed:
+        return _Speed()
+
+    def isClosed(self) -> bool:
+        return self.closed
+
+    def disconnect(self) -> None:
+        self.closed = True
+
+    def close(self) -> None:
+        self.closed = True
+
+
+class FlakyDevices:
+    """Device factory failing to open ``fail_opens`` times (e.g. the device is rebooting after a USB reset)"""
+    def __init__(self, fail_opens: int = 0, prepare=None) -> None:
+        self.fail_opens: int = fail_opens
+        self.prepare = prepare
+        self.opened: list[FakeDevice] = []
+
+    def __call__(self, pipeline) -> FakeDevice:
+        if self.fail_opens > 0:
+            self.fail_opens -= 1
+            raise RuntimeError('No available devices')
+        device = FakeDevice(pipeline)
+        if self.prepare is not None:
+            self.prepare(len(self.opened), device)
+        self.opened.append(device)
+        return device
+
+
+class FlakyStep:
+    """Counts up, raises an XLink error on the listed calls"""
+    def __init__(self, fail_on: set[int], stop_after: int) -> None:
+        self.fail_on: set[int] = fail_on
+        self.stop_after: int = stop_after
+        self.calls: int = 0
+        self.state: list[int] = []
+
+    def __call__(self, queues) -> bool:
+        self.calls += 1
+        if self.calls in self.fail_on:
+            raise RuntimeError(_XLINK_ERROR)
+        self.state.append(self.calls)
+        return len(self.state) < self.stop_after
+
+
+def _session(devices: FlakyDevices | None = None, open_queues=None, **kwargs) -> tuple[DeviceSession, list, list]:
+    sleeps: list[float] = []
+    opened: list[FakeDevice] = []
+
+    def record_open(device):
+        opened.append(device)
+        return open_queues(device) if open_queues is not None else object()
+
+    session = DeviceSession(object(), record_open, device_factory=devices or FakeDevice, sleep=sleeps.append, **kwargs)
+    return session, sleeps, opened
+
+
+def test_reconnects_and_keeps_caller_state():
+    session, sleeps, opened = _session()
+    step = FlakyStep(fail_on={2, 3, 5}, stop_after=4)
+    session.run(step)
+
+    assert session.reconnects == 3
+    assert session.connections == 4
+    assert len(opened) == 4 and len(set(map(id, opened))) == 4
+    assert all(device.closed for device in opened)
+    # state from before the drops is still there, nothing was replayed
+    assert step.state == [1, 4, 6, 7]
+    # two failures in a row double the wait, a successful step resets it
+    assert sleeps == [Session.INITIAL_BACKOFF, 2 * Session.INITIAL_BACKOFF, Session.INITIAL_BACKOFF]
+
+
+def test_backoff_is_capped():
+    session, sleeps, _ = _session(initial_backoff=0.5, max_backoff=3.0)
+    session.run(FlakyStep(fail_on=set(range(1, 7)), stop_after=1))
+    assert sleeps == [0.5, 1.0, 2.0, 3.0, 3.0, 3.0]
+
+
+def test_gives_up_after_max_reconnects():
+    session, sleeps, opened = _session(max_reconnects=2)
+    with pytest.raises(RuntimeError, match='X_LINK_ERROR'):
+        session.run(FlakyStep(fail_on=set(range(1, 100)), stop_after=1))
+    assert session.reconnects == 2
+    assert len(sleeps) == 2
+    assert len(opened) == 3
+    assert session.device is None
+
+
+def test_device_that_fails_to_open_is_retried():
+    devices = FlakyDevices(fail_opens=3)
+    session, sleeps, opened = _session(devices)
+    session.run(FlakyStep(fail_on=set(), stop_after=1))
+
+    assert session.reconnects == 3
+    assert session.connections == 1
+    assert sleeps == [0.5, 1.0, 2.0]
+    # open_queues only runs on an opened device
+    assert opened == devices.opened
+
+
+def test_device_that_never_opens_gives_up():
+    session, sleeps, opened = _session(FlakyDevices(fail_opens=10), max_reconnects=2)
+    with pytest.raises(RuntimeError, match='No available devices'):
+        session.run(FlakyStep(fail_on=set(), stop_after=1))
+    assert len(sleeps) == 2
+    assert opened == []
+
+
+def test_queues_failing_to_open_are_retried():
+    failures = [RuntimeError(_XLINK_ERROR)]
+
+    def open_queues(device):
+        if failures:
+            raise failures.pop()
+        return object()
+
+    devices = FlakyDevices()
+    session, sleeps, _ = _session(devices, open_queues)
+    session.run(FlakyStep(fail_on=set(), stop_after=1))
+
+    assert session.reconnects == 1
+    assert session.connections == 1
+    assert len(devices.opened) == 2
+    assert devices.opened[0].closed
+
+
+def test_host_error_while_opening_queues_is_raised():
+    def open_queues(device):
+        raise RuntimeError('bug in open_queues')
+
+    devices = FlakyDevices()
+    session, sleeps, _ = _session(devices, open_queues)
+    with pytest.raises(RuntimeError, match='bug'):
+        session.run(FlakyStep(fail_on=set(), stop_after=1))
+    assert sleeps == []
+    assert devices.opened[0].closed
+
+
+def test_host_errors_are_not_treated_as_disconnects():
+    session, sleeps, opened = _session()
+
+    def step(queues):
+        raise NotImplementedError('bug in step')
+
+    with pytest.raises(NotImplementedError):
+        session.run(step)
+    assert session.reconnects == 0
+    assert sleeps == []
+    assert opened[0].closed
+
+
+def test_closed_device_counts_as_disconnect():
+    session, _, _ = _session()
+    calls: list[int] = []
+
+    def step(queues):
+        calls.append(1)
+        if len(calls) == 1:
+            session.device.closed = True
+            raise RuntimeError('queue was closed')
+        return False
+
+    session.run(step)
+    assert session.reconnects == 1
+
+
+def _nn(sequence_num: int) -> FakeNNData:
+    return FakeNNData({'scores': np.zeros(1), 'geometry': np.zeros(1), 'angles': np.zeros(1)}, sequence_num, float(sequence_num))
+
+
+def test_host_stages_survive_reconnect(monkeypatch):
+    monkeypatch.setattr(results.east, 'decode', lambda _: [(RRect((10, 10), (130, 42), 0.0), 0.9)])
+
+    def prepare(index: int, device: FakeDevice) -> None:
+        if index == 0:
+            # detection 5 lost its frame, frame 7 is cropped but its recognition never comes back
+            device.queue('detnn_out').put(_nn(5))
+            device.queue('detnn_out').put(_nn(7))
+            device.queue('detnn_pass').put(FakeImgFrame(np.zeros((256, 256, 3), dtype=np.uint8), 7))
+        else:
+            # sequence numbers start over on the new connection
+            device.queue('detnn_out').put(_nn(0))
+            device.queue('detnn_pass').put(FakeImgFrame(np.zeros((256, 256, 3), dtype=np.uint8), 0))
+            device.queue('recnn_out').put(FakeNNData({'out': np.zeros((30, 37), dtype=np.float32)}, 0))
+
+    devices = FlakyDevices(fail_opens=1, prepare=prepare)
+    stages = HostStages()
+    session = DeviceSession(object(), stages.open, device_factory=devices, sleep=lambda _: None)
+
+    def step(queues):
+        if len(devices.opened) == 1 and devices.opened[0].queue('manip_cfg').sent:
+            devices.opened[0].disconnect()
+        return stages.step(queues)
+
+    stream = session.stream(step)
+    got = list(islice(stream, 2))
+    stream.close()
+
+    assert session.reconnects == 2
+    assert [(r.sequence_num, r.recognition_failed, r.texts) for r in got] == [(7, True, ['']), (0, False, ['0'])]
+    # the matcher was reset, so frame 0 was paired instead of dropped as older than frame 7,
+    # detection 5 of the first connection stays counted
+    assert (got[1].unmatched_detections, got[1].unmatched_frames) == (1, 0)
+    assert stages.matcher.pending == 0
+    assert all(device.closed for device in devices.opened)
@@ -0,0 +1,86 @@
+import pytest
+
+from utils.harness import FakeImgFrame, FakeNNData, FakeQueue
+from utils.sync import SequenceMatcher
+
+
+def _detection(seq: int) -> FakeNNData:
+    return FakeNNData({}, seq)
+
+
+def _frame(seq: int) -> FakeImgFrame:
+    return FakeImgFrame(None, seq)
+
+
+def _queues(detections: list[int], frames: list[int]) -> tuple[FakeQueue, FakeQueue]:
+    q_det, q_frames = FakeQueue(), FakeQueue()
+    for seq in detections:
+        q_det.put(_detection(seq))
+    for seq in frames:
+        q_frames.put(_frame(seq))
+    return q_det, q_frames
+
+
+def _seqs(pairs) -> list[tuple[int, int]]:
+    return [(det.getSequenceNum(), frame.getSequenceNum()) for det, frame in pairs]
+
+
+def test_dropped_detection_leaves_frame_unmatched():
+    matcher = SequenceMatcher()
+    pairs = matcher.poll(*_queues([1, 3], [1, 2, 3]))
+    assert _seqs(pairs) == [(1, 1), (3, 3)]
+    assert (matcher.unmatched_detections, matcher.unmatched_frames) == (0, 1)
+    assert matcher.pending == 0
+
+
+def test_dropped_frame_leaves_detection_unmatched():
+    matcher = SequenceMatcher()
+    pairs = matcher.poll(*_queues([1, 2, 3], [1, 3]))
+    assert _seqs(pairs) == [(1, 1), (3, 3)]
+    assert (matcher.unmatched_detections, matcher.unmatched_frames) == (1, 0)
+
+
+def test_pair_split_across_polls():
+    matcher = SequenceMatcher()
+    assert matcher.poll(*_queues([5], [])) == []
+    assert matcher.pending == 1
+    assert _seqs(matcher.poll(*_queues([], [5]))) == [(5, 5)]
+    assert matcher.pending == 0
+    assert matcher.matched == 1
+
+
+def test_capacity_overflow_drops_oldest():
+    matcher = SequenceMatcher(capacity=2)
+    assert matcher.poll(*_queues([1, 2, 3, 4], [])) == []
+    assert matcher.unmatched_detections == 2
+    assert matcher.pending == 2
+    assert _seqs(matcher.poll(*_queues([], [3, 4]))) == [(3, 3), (4, 4)]
+
+
+def test_tolerance_pairs_closest_neighbour():
+    assert SequenceMatcher(tolerance=0).poll(*_queues([10], [11])) == []
+
+    matcher = SequenceMatcher(tolerance=2)
+    assert _seqs(matcher.poll(*_queues([10], [11]))) == [(10, 11)]
+    assert _seqs(matcher.poll(*_queues([], [19, 20]))) == []
+    assert _seqs(matcher.poll(*_queues([20], []))) == [(20, 20)]
+    # 19 can still pair with 21
+    assert _seqs(matcher.poll(*_queues([21], []))) == [(21, 19)]
+
+
+def test_reset_counts_waiting_messages_and_restarts_sequence():
+    matcher = SequenceMatcher()
+    matcher.poll(*_queues([100, 101], [100]))
+    assert matcher.pending == 1     # detection 101 waits for its frame
+
+    matcher.reset()
+    assert matcher.pending == 0
+    assert (matcher.unmatched_detections, matcher.unmatched_frames) == (1, 0)
+    # without the reset detection 0 would be evicted as older than frame 100
+    assert _seqs(matcher.poll(*_queues([0], [0]))) == [(0, 0)]
+
+
+@pytest.mark.parametrize('capacity', [0, -1])
+def test_capacity_must_be_positive(capacity):
+    with pytest.raises(ValueError):
+        SequenceMatcher(capacity=capacity)
@@ -0,0 +1,225 @@
+"""Two stage text reading on the host CPU with OpenCV DNN or the OpenVINO runtime, for hosts without an OAK device"""
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, Future
+from pathlib import Path
+from typing import Iterator
+
+import numpy as np
+import cv2
+
+import decoding.east256x256 as east
+import decoding.text_recognition_0012 as tr12
+from utils.geometry import RRect
+from utils.mosaic import CropMosaic
+from utils.results import FrameResult
+from utils.settings import CpuBackend
+
+
+class _Network:
+    """Single network on the CPU, OpenVINO IR (``.xml``) through the OpenVINO runtime, anything else through ``cv2.dnn``
+
+    The ``opencv-python`` wheels are built without the OpenVINO backend, so IR
+    models cannot be read by ``cv2.dnn.readNet``. Not thread safe, every worker
+    thread loads its own instance.
+
+    Parameters
+    ----------
+    path : Path
+        Model file
+    batch_size : int | None
+        Reshape the input batch dimension of an IR model to this size
+    num_threads : int
+        Inference threads of an IR model, ``cv2.dnn`` uses ``cv2.setNumThreads``
+    """
+    def __init__(self, path: Path, batch_size: int | None = None, num_threads: int = 1) -> None:
+        self.path: Path = Path(path)
+        if self.path.suffix == '.xml':
+            try:
+                import openvino as ov
+            except ImportError as e:
+                raise ImportError(f'Loading {self.path} needs the OpenVINO runtime, pip install openvino') from e
+            core = ov.Core()
+            model = core.read_model(str(self.path))
+            if batch_size is not None:
+                shape = list(model.input().shape)
+                shape[0] = batch_size
+                model.reshape(shape)
+            compiled = core.compile_model(model, 'CPU', {'INFERENCE_NUM_THREADS': num_threads})
+            self.input_shape: tuple[int, ...] = tuple(compiled.input().shape)
+            self._outputs = compiled.outputs
+            self._request = compiled.create_infer_request()
+            self._net = None
+        else:
+            self._net = cv2.dnn.readNet(str(self.path))
+            self.input_shape = ()
+            self._names = self._net.getUnconnectedOutLayersNames()
+
+
+    def __call__(self, blob: np.ndarray) -> dict[str, np.ndarray]:
+        """Runs inference, returns outputs by name"""
+        if self._net is not None:
+            self._net.setInput(blob)
+            return {name: np.asarray(out) for name, out in zip(self._names, self._net.forward(self._names))}
+        result = self._request.infer({0: blob})
+        return {out.get_any_name() if out.get_names() else str(i): np.asarray(result[out]) for i, out in enumerate(self._outputs)}
+
+
+class CpuPipeline:
+    """Runs EAST detection and text-recognition-0012 on frames from a camera or a video file
+
+    Uses the same decoding code as the device path, only the raw tensors come
+    from ``cv2.dnn`` instead of ``dai.NNData``. Frames are processed by
+    ``threads`` workers, each with its own copy of both networks (``cv2.dnn.Net``
+    is not thread safe) limited to its share of the CPU cores, results are
+    returned in capture order as :class:`FrameResult`.
+
+    Parameters
+    ----------
+    source : str | int
+        Camera index or path to a video file
+    detection_model : Path
+        EAST model, OpenVINO IR or any format ``cv2.dnn.readNet`` accepts (e.g. ONNX)
+    recognition_model : Path
+        text-recognition-0012 as OpenVINO IR (``.xml``), its input shape decides
+        the crop layout and the batch is reshaped, neither is known for ``cv2.dnn`` models
+    threads : int
+        Number of frames processed concurrently
+    batch_size : int
+        Number of crops recognised in one forward pass
+    """
+    def __init__(self,
+                 source: str | int = CpuBackend.SOURCE,
+                 detection_model: Path = CpuBackend.DETECTION_MODEL,
+                 recognition_model: Path = CpuBackend.RECOGNITION_MODEL,
+                 threads: int = CpuBackend.INFERENCE_THREADS,
+                 batch_size: int = CpuBackend.BATCH_SIZE) -> None:
+        if threads < 1:
+            raise ValueError(f'threads must be positive, got {threads}')
+        if Path(recognition_model).suffix != '.xml':
+            raise ValueError(f'Recognition model must be an OpenVINO IR (.xml), got {recognition_model}')
+        self.source: str | int = int(source) if isinstance(source, str) and source.isdigit() else source
+        self.detection_model: Path = Path(detection_model)
+        self.recognition_model: Path = Path(recognition_model)
+        self.threads: int = threads
+        self.threads_per_worker: int = max(1, (os.cpu_count() or 1) // threads)
+        self.batch_size: int = batch_size
+        self.input_size: tuple[int, int] = CpuBackend.DETECTION_INPUT_SIZE
+        self._local: threading.local = threading.local()
+
+        self.frames: int = 0
+        self.crops: int = 0
+
+
+    def _networks(self) -> tuple[_Network, _Network, CropMosaic]:
+        """Networks and crop buffer of the calling worker thread, loaded on first use"""
+        if not hasattr(self._local, 'detnn'):
+            cv2.setNumThreads(self.threads_per_worker)
+            self._local.detnn = _Network(self.detection_model, num_threads=self.threads_per_worker)
+            self._local.recnn = _Network(self.recognition_model, self.batch_size, self.threads_per_worker)
+            self._local.mosaic = CropMosaic(self.batch_size, channels=self._local.recnn.input_shape[1])
+        return self._local.detnn, self._local.recnn, self._local.mosaic
+
+
+    def detect(self, preview: np.ndarray) -> np.ndarray:
+        """Runs EAST on a preview sized frame, returns array of tuples ``(RRect, confidence)``"""
+        detnn, _, _ = self._networks()
+        blob = cv2.dnn.blobFromImage(preview, 1.0, self.input_size, CpuBackend.DETECTION_MEAN, CpuBackend.DETECTION_SWAP_RB)
+        return east.decode_tensors(*split_east_outputs(detnn(blob)))
+
+
+    def recognise(self, preview: np.ndarray, rects: list[RRect]) -> list[str]:
+        """Crops ``rects`` out of ``preview`` and recognises them ``batch_size`` at a time"""
+        _, recnn, mosaic = self._networks()
+        texts: list[str] = []
+        for n in mosaic.batches(preview, rects):
+            output = next(iter(recnn(mosaic.planar.astype(np.float32)).values()))
+            texts.extend(tr12.decode_logits(output.reshape(30, mosaic.batch_size, 37))[:n])
+        return texts
+
+
+    def process(self, frame: np.ndarray, sequence_num: int = 0, timestamp: float | None = None) -> FrameResult:
+        """Full two stage read of a single frame, boxes refer to the preview sized frame"""
+        timestamp = time.monotonic() if timestamp is None else timestamp
+        start = time.perf_counter()
+        preview = cv2.resize(frame, self.input_size)
+        detections = self.detect(preview)
+        detected = time.perf_counter()
+        rects: list[RRect] = [rect for rect, _ in detections]
+        texts = self.recognise(preview, rects)
+        done = time.perf_counter()
+
+        return FrameResult(sequence_num=sequence_num,
+                           timestamp=timestamp,
+                           host_timestamp=time.monotonic(),
+                           boxes=rects,
+                           confidences=[float(conf) for _, conf in detections],
+                           texts=texts,
+                           timings={'detection': detected - start, 'recognition': done - detected, 'total': done - start})
+
+
+    def frames_from_source(self) -> Iterator[np.ndarray]:
+        """Frames read from the configured camera or video file until it runs out"""
+        capture = cv2.VideoCapture(self.source)
+        if not capture.isOpened():
+            raise RuntimeError(f'Cannot open video source {self.source!r}')
+        try:
+            while True:
+                ok, frame = capture.read()
+                if not ok:
+                    break
+                yield frame
+        finally:
+            capture.release()
+
+
+    def run(self, frames: Iterator[np.ndarray] | None = None) -> Iterator[FrameResult]:
+        """Processes ``frames`` (default: the configured source) and yields results of :meth:`process` in order
+
+        At most ``2 * threads`` frames are in flight, so a slow consumer slows down reading.
+        """
+        frames = self.frames_from_source() if frames is None else frames
+        pending: deque[Future] = deque()
+
+        with ThreadPoolExecutor(max_workers=self.threads, thread_name_prefix='cpu-inference') as executor:
+            for sequence_num, frame in enumerate(frames):
+                pending.append(executor.submit(self.process, frame, sequence_num, time.monotonic()))
+                if len(pending) >= 2 * self.threads:
+                    yield self._collect(pending.popleft())
+            while pending:
+                yield self._collect(pending.popleft())
+
+
+    def _collect(self, future: Future) -> FrameResult:
+        result = future.result()
+        self.frames += 1
+        self.crops += len(result.texts)
+        return result
+
+
+def split_east_outputs(outputs: dict[str, np.ndarray]) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Picks score map, box distances and angles out of EAST outputs by shape and name
+
+    Handles the original graph (score map + 5 channel geometry with the angle
+    last) and the depthai zoo layout (score map, 4 channel distances, angles).
+    The two single channel maps of the latter are told apart by
+    ``CpuBackend.EAST_SCORES_OUTPUT`` appearing in the output name.
+    """
+    channels = {name: out.reshape(-1, 64, 64).shape[0] for name, out in outputs.items()}
+    geometry = [name for name, c in channels.items() if c in (4, 5)]
+    single = [name for name, c in channels.items() if c == 1]
+
+    if len(geometry) != 1 or len(single) not in (1, 2) or len(outputs) != 1 + len(single):
+        raise ValueError(f'Unexpected EAST outputs {channels}')
+    geo = outputs[geometry[0]].reshape(-1, 64, 64)
+
+    if len(single) == 1 and geo.shape[0] == 5:
+        return outputs[single[0]], geo[:4], geo[4]
+
+    scores = [name for name in single if CpuBackend.EAST_SCORES_OUTPUT.lower() in name.lower()]
+    if len(single) != 2 or geo.shape[0] != 4 or len(scores) != 1:
+        raise ValueError(f'Cannot tell EAST score map from angles in outputs {channels}, set CpuBackend.EAST_SCORES_OUTPUT')
+    angles = next(name for name in single if name != scores[0])
+    return outputs[scores[0]], geo, outputs[angles]
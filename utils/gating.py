@@ -0,0 +1,204 @@
+"""Frame gating - decides whether a camera frame is worth running detection on"""
+from collections import deque
+from typing import Iterable
+
+import numpy as np
+from utils.settings import Gating
+
+
+class FrameGate:
+    """Pure python gating policy
+
+    A frame is passed to detection when any of the following holds:
+
+    * text was detected in one of the last ``hold_frames`` detected frames,
+    * the frame differs from the last detected frame by more than ``motion_threshold``,
+    * no frame was detected for ``1 / min_fps`` seconds.
+
+    Otherwise the frame is skipped, so the effective frame rate floats between
+    ``min_fps`` on an idle line and the camera FPS (or ``max_fps``) when busy.
+    The same policy runs on the device as a Script node, see :func:`device_script`.
+
+    Parameters
+    ----------
+    motion_threshold : float
+        Mean absolute difference of subsampled pixels (0-255) treated as a scene change
+    min_fps : float
+        Rate at which frames are detected even if nothing changes
+    hold_frames : int
+        Number of detected frames to keep passing every frame for after the last detection
+    subsample_step : int
+        Every ``subsample_step``-th pixel in both directions is used for the difference
+    max_fps : float | None
+        Upper bound for the detection rate, ``None`` means camera FPS
+    """
+    def __init__(self,
+                 motion_threshold: float = Gating.MOTION_THRESHOLD,
+                 min_fps: float = Gating.MIN_FPS,
+                 hold_frames: int = Gating.HOLD_FRAMES,
+                 subsample_step: int = Gating.SUBSAMPLE_STEP,
+                 max_fps: float | None = None) -> None:
+        if min_fps <= 0:
+            raise ValueError(f'min_fps must be positive, got {min_fps}')
+        if max_fps is not None and max_fps < min_fps:
+            raise ValueError(f'max_fps ({max_fps}) must not be lower than min_fps ({min_fps})')
+
+        self.motion_threshold: float = motion_threshold
+        self.min_fps: float = min_fps
+        self.max_fps: float | None = max_fps
+        self.hold_frames: int = hold_frames
+        self.subsample_step: int = max(1, int(subsample_step))
+
+        self._reference: np.ndarray | None = None   # signature of the last detected frame
+        self._last_pass: float | None = None        # timestamp of the last detected frame
+        self._hold: int = 0                         # detected frames left at full rate
+        self._passes: deque[float] = deque()        # timestamps of detected frames within the fps window
+
+        self.frames_seen: int = 0
+        self.frames_passed: int = 0
+
+
+    def signature(self, frame: np.ndarray) -> np.ndarray:
+        """Cheap subsampled version of a frame, the same pixels the device script samples
+
+        Parameters
+        ----------
+        frame : np.ndarray
+            Frame in HWC (as returned by ``getCvFrame``) or HW layout, only the first channel is used
+        """
+        sub = frame[::self.subsample_step, ::self.subsample_step]
+        if sub.ndim == 3:
+            sub = sub[..., 0]
+        return sub.astype(np.float32)
+
+
+    def difference(self, frame: np.ndarray) -> float:
+        """Mean absolute difference between ``frame`` and the last detected frame"""
+        if self._reference is None:
+            return float('inf')
+        sig = self.signature(frame)
+        if sig.shape != self._reference.shape:
+            return float('inf')
+        return float(np.abs(sig - self._reference).mean())
+
+
+    def should_detect(self, frame: np.ndarray, timestamp: float) -> bool:
+        """Decide whether ``frame`` captured at ``timestamp`` (seconds) should be detected"""
+        self.frames_seen += 1
+
+        if self._last_pass is not None:
+            elapsed = timestamp - self._last_pass
+            if self.max_fps is not None and elapsed < 1 / self.max_fps:
+                return False
+            passed = self._hold > 0 or elapsed >= 1 / self.min_fps or self.difference(frame) > self.motion_threshold
+            if not passed:
+                return False
+
+        self._reference = self.signature(frame)
+        self._last_pass = timestamp
+        self._passes.append(timestamp)
+        while timestamp - self._passes[0] > self._window:
+            self._passes.popleft()
+        self.frames_passed += 1
+        return True
+
+
+    def report(self, num_detections: int) -> None:
+        """Feed back the number of boxes found in the last detected frame"""
+        if num_detections > 0:
+            self._hold = self.hold_frames
+        elif self._hold > 0:
+            self._hold -= 1
+
+
+    @property
+    def _window(self) -> float:
+        # long enough to hold at least two passes at the idle floor
+        return max(1.0, 2 / self.min_fps)
+
+
+    @property
+    def effective_fps(self) -> float:
+        """Detection rate over the last few seconds of passed frames"""
+        if len(self._passes) < 2:
+            return 0.0
+        return (len(self._passes) - 1) / (self._passes[-1] - self._passes[0])
+
+
+def replay(gate: FrameGate, frames: Iterable[np.ndarray], timestamps: Iterable[float], detections: Iterable[int]) -> list[bool]:
+    """Runs ``gate`` over recorded frames and returns its decision for every frame
+
+    ``detections`` holds the number of boxes found in each frame, it is reported
+    back to the gate only for frames the gate passed, like on the device.
+    """
+    decisions: list[bool] = []
+    for frame, timestamp, num_detections in zip(frames, timestamps, detections):
+        passed = gate.should_detect(frame, timestamp)
+        if passed:
+            gate.report(num_detections)
+        decisions.append(passed)
+    return decisions
+
+
+_script_template: str = '''
+step = {step}
+threshold = {threshold}
+min_period = {min_period}
+max_period = {max_period}
+hold_frames = {hold_frames}
+
+reference = None
+last_pass = None
+hold = 0
+
+def signature(frame):
+    data = frame.getData()
+    w = frame.getWidth()
+    h = frame.getHeight()
+    sig = []
+    for y in range(0, h, step):
+        sig.extend(data[y * w:(y + 1) * w:step])
+    return sig
+
+while True:
+    frame = node.io['frame_in'].get()
+
+    hist = node.io['hist'].tryGet()
+    while hist is not None:
+        if hist.getData()[0] > 0:
+            hold = hold_frames
+        elif hold > 0:
+            hold -= 1
+        hist = node.io['hist'].tryGet()
+
+    now = Clock.now().total_seconds()
+    sig = signature(frame)
+
+    if last_pass is not None:
+        elapsed = now - last_pass
+        if max_period > 0 and elapsed < max_period:
+            continue
+        if hold <= 0 and elapsed < min_period:
+            diff = sum(abs(a - b) for a, b in zip(sig, reference)) / max(1, len(sig))
+            if diff <= threshold:
+                continue
+
+    reference = sig
+    last_pass = now
+    node.io['frame_out'].send(frame)
+'''
+
+
+def device_script(gate: FrameGate | None = None) -> str:
+    """Source of a ``dai.node.Script`` running the same policy as ``gate`` on the device
+
+    The script reads frames from input ``'frame_in'``, detection counts (one byte per
+    detected frame) from input ``'hist'`` and forwards passed frames to output ``'frame_out'``.
+    Only the first (blue) plane of planar frames is sampled.
+    """
+    gate = gate if gate is not None else FrameGate()
+    return _script_template.format(step=gate.subsample_step,
+                                   threshold=float(gate.motion_threshold),
+                                   min_period=1 / gate.min_fps,
+                                   max_period=0.0 if gate.max_fps is None else 1 / gate.max_fps,
+                                   hold_frames=int(gate.hold_frames))
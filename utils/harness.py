@@ -0,0 +1,371 @@
+"""Throughput/accuracy regression harness replaying recorded device outputs through the host path
+
+A corpus is a directory with ``manifest.json``::
+
+    {"version": 1, "frames": [{"file": "000000.npz", "truth": ["abc123", "x9"]}, ...]}
+
+and one ``.npz`` per frame holding the detection passthrough ``frame`` (HxWx3 uint8),
+the raw EAST tensors ``scores``, ``geometry``, ``angles`` and ``recognition`` - raw
+text-recognition-0012 output (30x37) of every box the device cropped, in detection order.
+A corpus is recorded from a device with ``main.py --record DIR`` (see :class:`CorpusRecorder`).
+"""
+import json
+import os
+import platform
+import time
+from collections import deque
+from dataclasses import dataclass, field, asdict
+from datetime import timedelta
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+
+from decoding.text_recognition_0012 import _chars_map
+from utils.mosaic import CropMosaic
+from utils.results import FrameResult, HostStages
+from utils.settings import Regression
+
+CORPUS_VERSION: int = 1
+
+_blank_index: int = 36  # '#' in text_recognition_0012._chars_map
+
+
+#-------------------------------------------------------------------------------------------------------------------------------
+# Fake device messages and queues
+#-------------------------------------------------------------------------------------------------------------------------------
+class _Tensor:
+    def __init__(self, name: str) -> None:
+        self.name: str = name
+
+
+class _Raw:
+    def __init__(self, names: list[str]) -> None:
+        self.tensors: list[_Tensor] = [_Tensor(name) for name in names]
+
+
+class FakeNNData:
+    """Stand-in for ``dai.NNData`` holding named fp16 layers"""
+    def __init__(self, layers: dict[str, np.ndarray], sequence_num: int = 0, timestamp: float = 0.0) -> None:
+        self._layers: dict[str, np.ndarray] = layers
+        self._sequence_num: int = sequence_num
+        self._timestamp: float = timestamp
+
+    def getRaw(self) -> _Raw:
+        return _Raw(list(self._layers))
+
+    def getLayerFp16(self, name: str) -> list[float]:
+        return self._layers[name].reshape(-1).tolist()
+
+    def getFirstLayerFp16(self) -> list[float]:
+        return next(iter(self._layers.values())).reshape(-1).tolist()
+
+    def getSequenceNum(self) -> int:
+        return self._sequence_num
+
+    def getTimestamp(self) -> timedelta:
+        return timedelta(seconds=self._timestamp)
+
+
+class FakeImgFrame:
+    """Stand-in for ``dai.ImgFrame`` of the detection passthrough"""
+    def __init__(self, frame: np.ndarray, sequence_num: int = 0) -> None:
+        self._frame: np.ndarray = frame
+        self._sequence_num: int = sequence_num
+
+    def getCvFrame(self) -> np.ndarray:
+        return self._frame
+
+    def getSequenceNum(self) -> int:
+        return self._sequence_num
+
+
+class FakeQueue:
+    """Stand-in for ``dai.DataOutputQueue`` / ``dai.DataInputQueue``
+
+    Messages sent to the queue are passed to ``on_send`` (if given) and kept in ``sent``.
+    """
+    def __init__(self, on_send=None) -> None:
+        self._messages: deque = deque()
+        self._on_send = on_send
+        self.sent: int = 0
+
+    def put(self, message: Any) -> None:
+        self._messages.append(message)
+
+    def get(self) -> Any:
+        if not self._messages:
+            raise RuntimeError('FakeQueue is empty, get() would block forever')
+        return self._messages.popleft()
+
+    def tryGet(self) -> Any | None:
+        return self._messages.popleft() if self._messages else None
+
+    def tryGetAll(self) -> list:
+        messages = list(self._messages)
+        self._messages.clear()
+        return messages
+
+    def send(self, message: Any) -> None:
+        self.sent += 1
+        if self._on_send is not None:
+            self._on_send(message)
+
+
+class FakeQueues:
+    """Same attributes as ``utils.session.Queues``, recognition answered from the recorded outputs"""
+    def __init__(self, batch_size: int) -> None:
+        self.batch_size: int = batch_size
+        self._recognition: deque[np.ndarray] = deque()  # recorded outputs of the current frame
+
+        self.cam_ctrl = FakeQueue()
+        self.manip_img = FakeQueue()
+        self.manip_cfg = FakeQueue()
+        self.detnn_out = FakeQueue()
+        self.detnn_pass = FakeQueue()
+        self.manip_out = FakeQueue()
+        self.recnn_out = FakeQueue()
+        self.gate_hist = None
+        self.recnn_batch_in = FakeQueue(self._answer_batch)
+        self.recnn_batch_out = FakeQueue()
+
+
+    def push(self, record: dict[str, np.ndarray], sequence_num: int, timestamp: float) -> None:
+        """Queues one recorded frame as if it just came from the device"""
+        self.detnn_out.put(FakeNNData({'scores': record['scores'], 'geometry': record['geometry'], 'angles': record['angles']},
+                                      sequence_num, timestamp))
+        self.detnn_pass.put(FakeImgFrame(record['frame'], sequence_num))
+        self._recognition = deque(record['recognition'])
+
+
+    def _answer_batch(self, message) -> None:
+        # boxes the device did not see (decode changed) get blank output
+        batch = np.zeros((30, self.batch_size, 37), dtype=np.float32)
+        batch[:, :, _blank_index] = 1.0
+        for i in range(self.batch_size):
+            if not self._recognition:
+                break
+            batch[:, i, :] = self._recognition.popleft()
+        self.recnn_batch_out.put(FakeNNData({'output': batch}, message.getSequenceNum()))
+
+
+def recognition_output(text: str) -> np.ndarray:
+    """Raw text-recognition-0012 output (30x37) decoding to ``text``, for synthetic corpora and tests"""
+    out = np.zeros((30, 37), dtype=np.float32)
+    out[:, _blank_index] = 1.0
+    # blanks between characters keep repeated ones apart
+    for i, char in enumerate(text):
+        out[2 * i, :] = 0.0
+        out[2 * i, _chars_map.index(char)] = 1.0
+    return out
+
+
+#-------------------------------------------------------------------------------------------------------------------------------
+# Corpus
+#-------------------------------------------------------------------------------------------------------------------------------
+def load_corpus(path: Path) -> list[tuple[dict[str, np.ndarray], list[str]]]:
+    """Loads all frames of a corpus as ``(record, ground_truth_texts)``"""
+    path = Path(path)
+    if not (path / 'manifest.json').is_file():
+        raise FileNotFoundError(f'No corpus in {path} (manifest.json missing), record one with main.py --record {path}')
+    manifest = json.loads((path / 'manifest.json').read_text())
+    if manifest.get('version') != CORPUS_VERSION:
+        raise ValueError(f'Unsupported corpus version {manifest.get("version")!r} in {path}, expected {CORPUS_VERSION}')
+
+    corpus: list[tuple[dict[str, np.ndarray], list[str]]] = []
+    for entry in manifest['frames']:
+        with np.load(path / entry['file']) as data:
+            record = {key: data[key] for key in ('frame', 'scores', 'geometry', 'angles', 'recognition')}
+        record['recognition'] = record['recognition'].reshape(-1, 30, 37)
+        corpus.append((record, list(entry['truth'])))
+    return corpus
+
+
+def save_frame(path: Path, index: int, frame: np.ndarray, scores: np.ndarray, geometry: np.ndarray,
+               angles: np.ndarray, recognition: list[np.ndarray], truth: list[str]) -> None:
+    """Adds a recorded frame to the corpus at ``path``, creating the manifest if needed
+
+    A frame already stored under ``index`` is replaced.
+    """
+    path = Path(path)
+    path.mkdir(parents=True, exist_ok=True)
+    manifest_path = path / 'manifest.json'
+    manifest = json.loads(manifest_path.read_text()) if manifest_path.exists() else {'version': CORPUS_VERSION, 'frames': []}
+
+    name = f'{index:06d}.npz'
+    np.savez_compressed(path / name, frame=frame, scores=scores, geometry=geometry, angles=angles,
+                        recognition=np.asarray(recognition, dtype=np.float32).reshape(-1, 30, 37))
+    manifest['frames'] = [entry for entry in manifest['frames'] if entry['file'] != name]
+    manifest['frames'].append({'file': name, 'truth': list(truth)})
+    manifest['frames'].sort(key=lambda entry: entry['file'])
+    manifest_path.write_text(json.dumps(manifest, indent=2))
+
+
+class CorpusRecorder:
+    """Recorder for :class:`utils.results.HostStages` writing every frame read on the device into a corpus
+
+    Ground truth starts as the texts recognised on the device, review and
+    correct it in ``manifest.json`` before the corpus is used for regressions.
+    Recording continues after frames already in the corpus.
+
+    Parameters
+    ----------
+    path : Path
+        Corpus directory
+    """
+    def __init__(self, path: Path) -> None:
+        self.path: Path = Path(path)
+        manifest_path = self.path / 'manifest.json'
+        frames = json.loads(manifest_path.read_text())['frames'] if manifest_path.exists() else []
+        self.index: int = max((int(Path(entry['file']).stem) for entry in frames), default=-1) + 1
+
+
+    def __call__(self, detnn_output: Any, frame: np.ndarray, recognition: list[np.ndarray], result: FrameResult) -> None:
+        scores, geometry, angles = (np.array(detnn_output.getLayerFp16(tensor.name), dtype=np.float32)
+                                    for tensor in detnn_output.getRaw().tensors)
+        save_frame(self.path, self.index, frame, scores, geometry, angles, recognition, result.texts)
+        self.index += 1
+
+
+#-------------------------------------------------------------------------------------------------------------------------------
+# Accuracy
+#-------------------------------------------------------------------------------------------------------------------------------
+def edit_distance(a: str, b: str) -> int:
+    """Levenshtein distance between two strings"""
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i]
+        for j, cb in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ca != cb)))
+        previous = current
+    return previous[-1]
+
+
+def score_frame(predicted: list[str], truth: list[str]) -> tuple[int, int, int]:
+    """Matches every ground truth text with the closest unused prediction
+
+    Returns
+    -------
+    tuple[int, int, int]
+        Correct characters, exactly read words and total characters of the ground truth
+    """
+    unused = list(predicted)
+    correct_chars, correct_words, total_chars = 0, 0, 0
+    for text in truth:
+        total_chars += len(text)
+        if not unused:
+            continue
+        distances = [edit_distance(text, p) for p in unused]
+        best = int(np.argmin(distances))
+        correct_chars += max(0, len(text) - distances[best])
+        correct_words += distances[best] == 0
+        unused.pop(best)
+    return correct_chars, correct_words, total_chars
+
+
+#-------------------------------------------------------------------------------------------------------------------------------
+# Harness
+#-------------------------------------------------------------------------------------------------------------------------------
+def host_identity() -> dict[str, Any]:
+    """Machine the throughput numbers were measured on"""
+    return {'system': platform.system(),
+            'machine': platform.machine(),
+            'processor': platform.processor(),
+            'cpus': os.cpu_count(),
+            'python': platform.python_version(),
+            'numpy': np.__version__}
+
+
+@dataclass
+class RegressionReport:
+    frames: int = 0
+    crops: int = 0
+    char_accuracy: float = 0.0
+    word_accuracy: float = 0.0
+    fps: float = 0.0
+    crops_per_s: float = 0.0
+    latency_ms: dict[str, float] = field(default_factory=dict)
+    host: dict[str, Any] = field(default_factory=host_identity)
+
+    def to_dict(self) -> dict[str, Any]:
+        return asdict(self)
+
+
+    def check(self, baseline: dict[str, Any] | None = None,
+              min_char_accuracy: float = Regression.MIN_CHAR_ACCURACY,
+              min_word_accuracy: float = Regression.MIN_WORD_ACCURACY,
+              accuracy_tolerance: float = Regression.ACCURACY_TOLERANCE,
+              throughput_tolerance: float = Regression.THROUGHPUT_TOLERANCE) -> list[str]:
+        """Regressions against absolute thresholds and an optional baseline report, empty if none
+
+        Throughput and latency are only compared with a baseline measured on the
+        same host (see :meth:`same_host`), accuracy always is.
+        """
+        failures: list[str] = []
+        if self.char_accuracy < min_char_accuracy:
+            failures.append(f'char accuracy {self.char_accuracy:.4f} < {min_char_accuracy:.4f}')
+        if self.word_accuracy < min_word_accuracy:
+            failures.append(f'word accuracy {self.word_accuracy:.4f} < {min_word_accuracy:.4f}')
+
+        if baseline is not None:
+            for metric in ('char_accuracy', 'word_accuracy'):
+                if getattr(self, metric) < baseline[metric] - accuracy_tolerance:
+                    failures.append(f'{metric} {getattr(self, metric):.4f} regressed from {baseline[metric]:.4f}')
+            if not self.same_host(baseline):
+                return failures
+            for metric in ('fps', 'crops_per_s'):
+                if baseline[metric] > 0 and getattr(self, metric) < baseline[metric] * (1 - throughput_tolerance):
+                    failures.append(f'{metric} {getattr(self, metric):.1f} regressed from {baseline[metric]:.1f}')
+            for percentile, value in baseline.get('latency_ms', {}).items():
+                current = self.latency_ms.get(percentile)
+                if current is not None and value > 0 and current > value * (1 + throughput_tolerance):
+                    failures.append(f'latency {percentile} {current:.2f} ms regressed from {value:.2f} ms')
+        return failures
+
+
+    def same_host(self, baseline: dict[str, Any]) -> bool:
+        """Whether ``baseline`` was measured on the same kind of host, baselines without a host never are"""
+        return baseline.get('host') == self.host
+
+
+def run(corpus: list[tuple[dict[str, np.ndarray], list[str]]],
+        batch_size: int = Regression.BATCH_SIZE,
+        repeat: int = Regression.REPEAT) -> RegressionReport:
+    """Replays ``corpus`` ``repeat`` times through :class:`HostStages` and measures accuracy and speed
+
+    The mosaic path is used, so detection decoding, NMS, crop planning and
+    warping, recognition decoding and per-frame aggregation all run and are
+    timed as on the host connected to a device. Recognition outputs are
+    replayed as recorded, in detection order, whatever the crops hold, so
+    accuracy only covers detection decoding, NMS and recognition decoding.
+    """
+    stages: HostStages = HostStages(mosaic=CropMosaic(batch_size))
+    q: FakeQueues = FakeQueues(batch_size)
+    report: RegressionReport = RegressionReport()
+    latencies: list[float] = []
+    correct_chars, correct_words, total_chars, total_words = 0, 0, 0, 0
+
+    start = time.perf_counter()
+    for iteration in range(repeat):
+        for index, (record, truth) in enumerate(corpus):
+            q.push(record, iteration * len(corpus) + index, time.monotonic())
+            results: list[FrameResult] = stages.step(q)
+
+            for result in results:
+                latencies.append(result.latency)
+                report.frames += 1
+                report.crops += len(result.boxes)
+                chars, words, n_chars = score_frame(result.texts, truth)
+                correct_chars += chars
+                correct_words += words
+                total_chars += n_chars
+                total_words += len(truth)
+    elapsed = max(time.perf_counter() - start, 1e-9)
+
+    report.char_accuracy = correct_chars / total_chars if total_chars else 1.0
+    report.word_accuracy = correct_words / total_words if total_words else 1.0
+    report.fps = report.frames / elapsed
+    report.crops_per_s = report.crops / elapsed
+    if latencies:
+        report.latency_ms = {f'p{p}': float(np.percentile(latencies, p) * 1000) for p in (50, 95, 99)}
+    return report
@@ -0,0 +1,103 @@
+"""Host side cropping of rotated text regions packed into one recognition batch"""
+import numpy as np
+import depthai as dai
+import cv2
+from utils.geometry import RRect
+from utils.settings import Mosaic
+
+
+def crop_transform(rect: RRect, size: tuple[int, int] = Mosaic.CROP_SIZE) -> np.ndarray:
+    """Affine matrix mapping the rotated rectangle onto an upright crop of ``size`` (width, height)
+
+    Parameters
+    ----------
+    rect : RRect
+        Region in frame coordinates
+    size : tuple[int, int]
+        Width and height of the crop
+
+    Returns
+    -------
+    np.ndarray
+        2x3 matrix for ``cv2.warpAffine``
+    """
+    w, h = size
+    A, B, C, D = rect.get_rotated_points().astype(np.float32)
+    # box edges onto crop edges: D (top-left) -> (0, 0), C (top-right) -> (w, 0), B (bottom-right) -> (w, h)
+    src = np.array([D, C, B], dtype=np.float32)
+    dst = np.array([[0, 0], [w, 0], [w, h]], dtype=np.float32)
+    return cv2.getAffineTransform(src, dst)
+
+
+class CropMosaic:
+    """Preallocated planar buffer holding ``batch_size`` crops sent as a single message
+
+    The buffer has the network input layout ``[batch_size, channels, h, w]``.
+    With one channel crops are converted to luminance, with three they stay BGR.
+
+    Parameters
+    ----------
+    batch_size : int
+        Number of crops the recognition network was compiled for
+    size : tuple[int, int]
+        Width and height of a single crop
+    channels : int
+        Input channels of the recognition network, 1 or 3
+    """
+    def __init__(self, batch_size: int = Mosaic.BATCH_SIZE, size: tuple[int, int] = Mosaic.CROP_SIZE, channels: int = Mosaic.CHANNELS) -> None:
+        if batch_size < 1:
+            raise ValueError(f'batch_size must be positive, got {batch_size}')
+        if channels not in (1, 3):
+            raise ValueError(f'channels must be 1 or 3, got {channels}')
+        self.batch_size: int = batch_size
+        self.size: tuple[int, int] = size
+        self.channels: int = channels
+        w, h = size
+        self.planar: np.ndarray = np.zeros((batch_size, channels, h, w), dtype=np.uint8)    # network input layout
+        # warpAffine destination of BGR crops, grayscale ones are warped straight into planar
+        self._interleaved: np.ndarray | None = np.zeros((batch_size, h, w, 3), dtype=np.uint8) if channels == 3 else None
+
+
+    def pack(self, frame: np.ndarray, rects: list[RRect]) -> int:
+        """Cuts up to ``batch_size`` rotated crops from ``frame`` into the planar buffer
+
+        Unused slots are zeroed. Returns the number of crops packed.
+        """
+        n = min(len(rects), self.batch_size)
+        if self.channels == 1:
+            gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+            for i in range(n):
+                cv2.warpAffine(gray, crop_transform(rects[i], self.size), self.size,
+                               dst=self.planar[i, 0], flags=cv2.INTER_LINEAR, borderMode=cv2.BORDER_REPLICATE)
+            self.planar[n:] = 0
+            return n
+
+        for i in range(n):
+            cv2.warpAffine(frame, crop_transform(rects[i], self.size), self.size,
+                           dst=self._interleaved[i], flags=cv2.INTER_LINEAR, borderMode=cv2.BORDER_REPLICATE)
+        self._interleaved[n:] = 0
+        np.copyto(self.planar, self._interleaved.transpose(0, 3, 1, 2))
+        return n
+
+
+    def batches(self, frame: np.ndarray, rects: list[RRect]):
+        """Yields the number of crops packed for every batch needed to cover ``rects``
+
+        The planar buffer is reused, so it has to be sent before the next batch is requested.
+        """
+        for start in range(0, len(rects), self.batch_size):
+            yield self.pack(frame, rects[start:start + self.batch_size])
+
+
+    def to_imgframe(self) -> dai.ImgFrame:
+        """Wraps the planar buffer in an ``ImgFrame`` ready to be sent to the recognition network
+
+        The crops are stacked vertically, ``GRAY8`` for one channel, ``BGR888p`` (planes per crop) for three.
+        """
+        w, h = self.size
+        img_frame: dai.ImgFrame = dai.ImgFrame()
+        img_frame.setData(self.planar.reshape(-1))
+        img_frame.setType(dai.ImgFrame.Type.GRAY8 if self.channels == 1 else dai.ImgFrame.Type.BGR888p)
+        img_frame.setWidth(w)
+        img_frame.setHeight(h * self.batch_size)
+        return img_frame
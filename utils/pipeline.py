@@ -1,8 +1,22 @@
 import depthai as dai
 from pathlib import Path
-import datetime
-
-def create_pipeline() -> dai.Pipeline:
+from utils.gating import FrameGate, device_script
+
+def create_pipeline(gate: FrameGate | None = None, mosaic_batch: int = 0) -> dai.Pipeline:
+    """Builds the two stage pipeline
+
+    Parameters
+    ----------
+    gate : FrameGate | None
+        If given, camera preview goes through a Script node running this gating
+        policy, so skipped frames never reach the detection network nor the host.
+        The host reports detection counts to the ``'gate_hist'`` stream.
+    mosaic_batch : int
+        If positive, adds a recognition network compiled for this batch size fed
+        by the ``'recnn_batch_in'`` stream with crops packed on the host
+        (see utils/mosaic.py), results go to ``'recnn_batch_out'``.
+        The blob is compiled by ``python getblob.py --batch N``.
+    """
     pipeline: dai.Pipeline = dai.Pipeline()
 
     #------------------------------------------------------------------
@@ -13,8 +27,6 @@ def create_pipeline() -> dai.Pipeline:
     cam = pipeline.create(dai.node.ColorCamera)
 
     detnn = pipeline.create(dai.node.NeuralNetwork)
-    detnn_sync = pipeline.create(dai.node.Sync)
-    detnn_demux = pipeline.create(dai.node.MessageDemux)
     detnn_out_xout = pipeline.create(dai.node.XLinkOut)
     detnn_pass_xout = pipeline.create(dai.node.XLinkOut)
 
@@ -30,6 +42,27 @@ def create_pipeline() -> dai.Pipeline:
     # properties
     #------------------------------------------------------------------
 
+    if gate is not None:
+        gate_script = pipeline.create(dai.node.Script)
+        gate_hist_xin = pipeline.create(dai.node.XLinkIn)
+        gate_script.setScript(device_script(gate))
+        gate_script.inputs['frame_in'].setBlocking(False)
+        gate_script.inputs['frame_in'].setQueueSize(1)
+        gate_script.inputs['hist'].setBlocking(False)
+        gate_hist_xin.setStreamName('gate_hist')
+
+    if mosaic_batch > 0:
+        recnn_batch_xin = pipeline.create(dai.node.XLinkIn)
+        recnn_batch = pipeline.create(dai.node.NeuralNetwork)
+        recnn_batch_out_xout = pipeline.create(dai.node.XLinkOut)
+        recnn_batch_xin.setStreamName('recnn_batch_in')
+        recnn_batch.setBlobPath((Path('.')/'models'/f'text-recognition-0012_batch{mosaic_batch}.blob').resolve().absolute())
+        recnn_batch.input.setBlocking(True)
+        recnn_batch.input.setQueueSize(2)
+        recnn_batch_out_xout.setStreamName('recnn_batch_out')
+        recnn_batch_xin.out.link(recnn_batch.input)
+        recnn_batch.out.link(recnn_batch_out_xout.input)
+
     cam.setBoardSocket(dai.CameraBoardSocket.CAM_A)
     cam.setInterleaved(False)
     cam.setPreviewSize(256,256)
@@ -41,8 +74,6 @@ def create_pipeline() -> dai.Pipeline:
     detnn_out_xout.setStreamName('detnn_out')
     detnn_pass_xout.setStreamName('detnn_pass')
 
-    detnn_sync.setSyncThreshold(datetime.timedelta(seconds=0.5))
-
     manip.setWaitForConfigInput(True)
     manip_cfg_xin.setStreamName('manip_cfg')
     manip_img_xin.setStreamName('manip_img')
@@ -56,16 +87,16 @@ def create_pipeline() -> dai.Pipeline:
     #------------------------------------------------------------------
 
     cam_control_xin.out.link(cam.inputControl)
-    cam.preview.link(detnn.input)
-
-    # 1st stage
-    detnn.out.link(detnn_sync.inputs['demux_out'])
-    detnn.passthrough.link(detnn_sync.inputs['demux_pass'])
-
-    # Syncing
-    detnn_sync.out.link(detnn_demux.input)
-    detnn_demux.outputs['demux_out'].link(detnn_out_xout.input)
-    detnn_demux.outputs['demux_pass'].link(detnn_pass_xout.input)
+    if gate is not None:
+        cam.preview.link(gate_script.inputs['frame_in'])
+        gate_script.outputs['frame_out'].link(detnn.input)
+        gate_hist_xin.out.link(gate_script.inputs['hist'])
+    else:
+        cam.preview.link(detnn.input)
+
+    # 1st stage, paired on the host by sequence number (utils/sync.py)
+    detnn.out.link(detnn_out_xout.input)
+    detnn.passthrough.link(detnn_pass_xout.input)
 
     # 2nd stage
     manip_cfg_xin.out.link(manip.inputConfig)
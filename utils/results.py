@@ -0,0 +1,462 @@
+"""Structured per-frame results and a streaming API for embedding the reader in other services"""
+import asyncio
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, AsyncIterator, Callable, Iterable, Iterator
+
+import numpy as np
+import depthai as dai
+
+import decoding.east256x256 as east
+import decoding.text_recognition_0012 as tr12
+from utils.geometry import RRect
+from utils.gating import FrameGate
+from utils.mosaic import CropMosaic
+from utils.pipeline import create_pipeline
+from utils.session import DeviceSession, Queues
+from utils.settings import Results, Mosaic, CpuBackend
+from utils.sync import SequenceMatcher
+import utils.Logger as Logger
+
+
+@dataclass
+class FrameResult:
+    """Everything read from a single frame
+
+    ``timestamp`` is the capture time and ``host_timestamp`` the time the result
+    was completed, both on the host monotonic clock in seconds. ``timings`` holds
+    host side durations in seconds under the same keys on both backends:
+
+    * ``'detection'`` - EAST decoding and NMS (plus inference on the CPU backend),
+    * ``'recognition'`` - from the decoded boxes to all texts (cropping, inference, decoding),
+    * ``'total'`` - sum of the two.
+
+    If not every box could be recognised in time ``recognition_failed`` is set
+    and all ``texts`` are empty, texts are never paired with the wrong box.
+    ``unmatched_detections`` and ``unmatched_frames`` count detection outputs and
+    frames dropped without a pair since the stream started (always 0 on the CPU
+    backend).
+    """
+    sequence_num: int
+    timestamp: float
+    host_timestamp: float
+    boxes: list[RRect] = field(default_factory=list)
+    confidences: list[float] = field(default_factory=list)
+    texts: list[str] = field(default_factory=list)
+    timings: dict[str, float] = field(default_factory=dict)
+    recognition_failed: bool = False
+    unmatched_detections: int = 0
+    unmatched_frames: int = 0
+
+    @property
+    def latency(self) -> float:
+        """Time from capture to result in seconds"""
+        return self.host_timestamp - self.timestamp
+
+
+@dataclass
+class _Recording:
+    # what a recorder gets once the frame is read
+    detnn_output: Any
+    frame: np.ndarray
+    recognition: list[np.ndarray] = field(default_factory=list)
+
+
+@dataclass
+class _PendingFrame:
+    # frame waiting for recognition of its ImageManip crops
+    result: FrameResult
+    started: float
+    deadline: float
+    texts: list[str] = field(default_factory=list)
+    expired: bool = False
+    recording: _Recording | None = None
+
+
+class HostStages:
+    """Host side of the device pipeline: pairing, detection decoding, cropping and recognition
+
+    Keeps its state (sequence matcher, crop buffer) across reconnects, queues
+    are passed to every :meth:`step`.
+
+    With ``ImageManip`` crops recognition is asynchronous: crops of a frame are
+    sent tagged with its sequence number, :meth:`step` keeps pairing new frames
+    and returns frames in order once all their texts arrived, or as
+    ``recognition_failed`` after ``Results.RECOGNITION_TIMEOUT``. Mosaic batches
+    are waited for (the crop buffer is reused), at most that long per batch.
+
+    Parameters
+    ----------
+    gate : FrameGate | None
+        Gate the pipeline was built with, detection counts are reported back to it
+    mosaic : CropMosaic | None
+        Crop on the host and recognise in batches instead of ``ImageManip`` per box
+    logger : Logger.Logger | None
+        Where to report connection details
+    recorder : Callable | None
+        Called as ``recorder(detnn_output, frame, recognition, result)`` for every
+        frame read without failure, ``recognition`` holds the raw 30x37 output of
+        every box. E.g. :class:`utils.harness.CorpusRecorder`
+    """
+    def __init__(self, gate: FrameGate | None = None, mosaic: CropMosaic | None = None, logger: Logger.Logger | None = None,
+                 recorder: Callable[[Any, np.ndarray, list[np.ndarray], FrameResult], None] | None = None) -> None:
+        self.gate: FrameGate | None = gate
+        self.mosaic: CropMosaic | None = mosaic
+        self.matcher: SequenceMatcher = SequenceMatcher()
+        self.logger: Logger.Logger = logger if logger is not None else Logger.Logger(False)
+        self.recorder: Callable[[Any, np.ndarray, list[np.ndarray], FrameResult], None] | None = recorder
+        self.recognition_timeouts: int = 0
+        self._unmatched: int = 0
+        self._pending: deque[_PendingFrame] = deque()
+        self._batch_seq: int = 0
+
+
+    def open(self, device: dai.Device) -> Queues:
+        """Creates queues on a fresh connection and starts autofocus"""
+        self.logger('USB speed:', device.getUsbSpeed().name)
+
+        self.logger(f'\nAvaillable input queues: {device.getInputQueueNames()}')
+        self.logger(f'Availlable output queues: {device.getOutputQueueNames()}\n')
+        q: Queues = Queues(device, gating=self.gate is not None, mosaic=self.mosaic is not None)
+
+        ctrl: dai.CameraControl = dai.CameraControl()
+        ctrl.setAutoFocusMode(dai.CameraControl.AutoFocusMode.AUTO)
+        ctrl.setAutoFocusTrigger()
+        q.cam_ctrl.send(ctrl)
+
+        # sequence numbers start over on a new connection, crops in flight are lost
+        self.matcher.reset()
+        for pending in self._pending:
+            pending.expired = True
+        return q
+
+
+    def step(self, q: Queues) -> list[FrameResult]:
+        """Processes all detection/frame pairs available in the queues, returns the completed frames"""
+        results: list[FrameResult] = []
+        for detnn_output, detnn_frame in self.matcher.poll(q.detnn_out, q.detnn_pass):
+            result = self.process(q, detnn_output, detnn_frame)
+            if result is not None:
+                results.append(result)
+        if self.mosaic is None:
+            results.extend(self._collect_manip(q))
+
+        unmatched = self.matcher.unmatched_detections + self.matcher.unmatched_frames
+        if unmatched != self._unmatched:
+            self._unmatched = unmatched
+            self.logger(f'Unmatched messages: {self.matcher.unmatched_detections} detections, {self.matcher.unmatched_frames} frames')
+
+        if not results:
+            time.sleep(Results.POLL_INTERVAL)
+        return results
+
+
+    def process(self, q: Queues, detnn_output: dai.NNData, detnn_frame: dai.ImgFrame) -> FrameResult | None:
+        """Reads a single frame, ``None`` if its recognition is still running on the device (see :meth:`step`)"""
+        start = time.perf_counter()
+        frame: np.ndarray = detnn_frame.getCvFrame()
+        detections = east.decode(detnn_output)
+        decoded = time.perf_counter()
+
+        # feed detection history back to the gating script
+        if q.gate_hist is not None:
+            hist: dai.Buffer = dai.Buffer()
+            hist.setData([min(len(detections), 255)])
+            q.gate_hist.send(hist)
+
+        rects: list[RRect] = [rect for rect, _ in detections]
+        result: FrameResult = FrameResult(sequence_num=detnn_output.getSequenceNum(),
+                                          timestamp=detnn_output.getTimestamp().total_seconds(),
+                                          host_timestamp=0.0,
+                                          boxes=rects,
+                                          confidences=[float(conf) for _, conf in detections],
+                                          timings={'detection': decoded - start})
+
+        recording: _Recording | None = _Recording(detnn_output, frame) if self.recorder is not None else None
+        if self.mosaic is None:
+            self._send_manip(q, frame, rects, result.sequence_num)
+            self._pending.append(_PendingFrame(result, decoded, time.monotonic() + Results.RECOGNITION_TIMEOUT, recording=recording))
+            return None
+
+        texts: list[str] | None = self._recognise_mosaic(q, frame, rects, recording)
+        self._finish(result, texts, decoded, recording)
+        return result
+
+
+    def _finish(self, result: FrameResult, texts: list[str] | None, started: float, recording: _Recording | None = None) -> None:
+        # texts=None: recognition of the frame failed
+        done = time.perf_counter()
+        if texts is None:
+            self.recognition_timeouts += 1
+            result.recognition_failed = True
+            texts = [''] * len(result.boxes)
+        result.texts = texts
+        result.unmatched_detections = self.matcher.unmatched_detections
+        result.unmatched_frames = self.matcher.unmatched_frames
+        result.host_timestamp = time.monotonic()
+        result.timings['recognition'] = done - started
+        result.timings['total'] = result.timings['detection'] + result.timings['recognition']
+
+        if recording is not None and not result.recognition_failed:
+            self.recorder(recording.detnn_output, recording.frame, recording.recognition, result)
+
+
+    def _recognise_mosaic(self, q: Queues, frame: np.ndarray, rects: list[RRect], recording: _Recording | None = None) -> list[str] | None:
+        # crop on the host and recognise all regions in as few messages as possible
+        texts: list[str] = []
+        for n in self.mosaic.batches(frame, rects):
+            self._batch_seq += 1
+            batch: dai.ImgFrame = self.mosaic.to_imgframe()
+            batch.setSequenceNum(self._batch_seq)
+            q.recnn_batch_in.send(batch)
+
+            # outputs carry the sequence number of their batch, late ones of a failed batch are skipped
+            deadline = time.monotonic() + Results.RECOGNITION_TIMEOUT
+            while True:
+                recnn_out: dai.NNData | None = q.recnn_batch_out.tryGet()
+                if recnn_out is not None and recnn_out.getSequenceNum() == self._batch_seq:
+                    break
+                if recnn_out is None:
+                    if time.monotonic() >= deadline:
+                        return None
+                    time.sleep(Results.POLL_INTERVAL)
+            texts.extend(tr12.decode_batch(recnn_out, self.mosaic.batch_size)[:n])
+            if recording is not None:
+                coded = np.array(recnn_out.getFirstLayerFp16(), dtype=np.float32).reshape(30, self.mosaic.batch_size, 37)
+                recording.recognition.extend(coded[:, i] for i in range(n))
+        return texts
+
+
+    def _collect_manip(self, q: Queues) -> list[FrameResult]:
+        # hand the recognised crops to their frames, outputs of unknown or failed frames are dropped
+        frames: dict[int, _PendingFrame] = {pending.result.sequence_num: pending for pending in self._pending if not pending.expired}
+        for recnn_out in q.recnn_out.tryGetAll():
+            pending = frames.get(recnn_out.getSequenceNum())
+            if pending is not None and len(pending.texts) < len(pending.result.boxes):
+                pending.texts.append(tr12.decode(recnn_out))
+                if pending.recording is not None:
+                    pending.recording.recognition.append(np.array(recnn_out.getFirstLayerFp16(), dtype=np.float32).reshape(30, 37))
+
+        # frames are returned in order, a late frame holds back the ones after it
+        now = time.monotonic()
+        results: list[FrameResult] = []
+        while self._pending:
+            pending = self._pending[0]
+            if len(pending.texts) == len(pending.result.boxes):
+                self._finish(pending.result, pending.texts, pending.started, pending.recording)
+            elif pending.expired or now >= pending.deadline:
+                self._finish(pending.result, None, pending.started)
+            else:
+                break
+            results.append(self._pending.popleft().result)
+        return results
+
+
+    def _send_manip(self, q: Queues, frame: np.ndarray, rects: list[RRect], sequence_num: int) -> None:
+        # every crop (and so its recognition output) carries the sequence number of the image it was cut from
+        for idx, rect in enumerate(rects):
+            cfg: dai.ImageManipConfig = dai.ImageManipConfig()
+            cfg.setCropRotatedRect(rect.get_depthai_RotatedRect(), False)
+            cfg.setResize(120, 32)
+
+            if idx == 0:
+                w, h, _ = frame.shape
+                imgFrame = dai.ImgFrame()
+                imgFrame.setData(frame.transpose(2, 0, 1).flatten())
+                imgFrame.setType(dai.ImgFrame.Type.BGR888p)
+                imgFrame.setWidth(w)
+                imgFrame.setHeight(h)
+                imgFrame.setSequenceNum(sequence_num)
+                q.manip_img.send(imgFrame)
+            else:
+                cfg.setReusePreviousImage(True)
+            q.manip_cfg.send(cfg)
+
+
+def read_device(gate: FrameGate | None = None, mosaic: CropMosaic | None = None, logger: Logger.Logger | None = None,
+                record: Path | None = None) -> Iterator[FrameResult]:
+    """Results of the OAK device pipeline, reconnecting on device errors, until the generator is closed
+
+    With ``record`` every frame is also added to the regression corpus in that directory.
+    """
+    recorder = None
+    if record is not None:
+        # harness imports HostStages from this module
+        from utils.harness import CorpusRecorder
+        recorder = CorpusRecorder(record)
+    stages: HostStages = HostStages(gate, mosaic, logger, recorder)
+    pipeline: dai.Pipeline = create_pipeline(gate, mosaic.batch_size if mosaic is not None else 0)
+    session: DeviceSession = DeviceSession(pipeline, stages.open, logger=logger)
+    yield from session.stream(stages.step)
+
+
+def read_cpu(source: str | int = CpuBackend.SOURCE, threads: int = CpuBackend.INFERENCE_THREADS, batch_size: int = CpuBackend.BATCH_SIZE) -> Iterator[FrameResult]:
+    """Results of the host CPU backend reading from a camera or a video file"""
+    # cpu_backend imports FrameResult from this module
+    from utils.cpu_backend import CpuPipeline
+    yield from CpuPipeline(source, threads=threads, batch_size=batch_size).run()
+
+
+class ResultStream:
+    """Iterates results of ``source`` in a background thread with a bounded buffer
+
+    Usable as a plain iterator (``for result in stream``) and as an async
+    iterator (``async for result in stream``). When the consumer falls behind,
+    ``drop_policy`` decides what happens once ``max_buffer`` results are waiting:
+
+    * ``'block'`` - the producer waits, which in turn drops frames on the device queues,
+    * ``'drop_oldest'`` - the oldest waiting result is discarded,
+    * ``'drop_newest'`` - the new result is discarded.
+
+    Parameters
+    ----------
+    source : Iterable[FrameResult]
+        E.g. :func:`read_device` or :func:`read_cpu`
+    max_buffer : int
+        Maximum number of results waiting for the consumer
+    drop_policy : str
+        One of ``'block'``, ``'drop_oldest'``, ``'drop_newest'``
+    """
+    _policies: tuple[str, ...] = ('block', 'drop_oldest', 'drop_newest')
+
+    def __init__(self, source: Iterable[FrameResult], max_buffer: int = Results.MAX_BUFFER, drop_policy: str = Results.DROP_POLICY) -> None:
+        if drop_policy not in self._policies:
+            raise ValueError(f'drop_policy must be one of {self._policies}, got {drop_policy!r}')
+        if max_buffer < 1:
+            raise ValueError(f'max_buffer must be positive, got {max_buffer}')
+        self.source: Iterable[FrameResult] = source
+        self.max_buffer: int = max_buffer
+        self.drop_policy: str = drop_policy
+        self.dropped: int = 0
+
+        self._buffer: deque[FrameResult] = deque()
+        self._cond: threading.Condition = threading.Condition()
+        self._thread: threading.Thread | None = None
+        self._finished: bool = False
+        self._closed: bool = False
+        self._error: BaseException | None = None
+
+
+    def start(self) -> 'ResultStream':
+        """Starts the producer thread, called implicitly by iteration"""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._produce, name='result-stream', daemon=True)
+            self._thread.start()
+        return self
+
+
+    def close(self, timeout: float | None = Results.CLOSE_TIMEOUT) -> None:
+        """Stops the producer, the source is closed once it yields its next result
+
+        Waits at most ``timeout`` seconds for that to happen. Device reads poll
+        with ``Results.RECOGNITION_TIMEOUT``, but a source stuck elsewhere (e.g.
+        a camera that stopped delivering frames) keeps the daemon producer and
+        its device open after the timeout, check :meth:`alive`.
+        """
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout)
+
+
+    def alive(self) -> bool:
+        """Whether the producer thread is still running"""
+        return self._thread is not None and self._thread.is_alive()
+
+
+    def get(self, timeout: float | None = None) -> FrameResult | None:
+        """Next result, ``None`` when the source is exhausted (or on timeout)"""
+        self.start()
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._buffer or self._finished or self._closed, timeout):
+                return None
+            if self._buffer:
+                result = self._buffer.popleft()
+                self._cond.notify_all()
+                return result
+            if self._error is not None:
+                raise self._error
+            return None
+
+
+    def __iter__(self) -> Iterator[FrameResult]:
+        try:
+            while (result := self.get()) is not None:
+                yield result
+        finally:
+            self.close()
+
+
+    async def __aiter__(self) -> AsyncIterator[FrameResult]:
+        loop = asyncio.get_running_loop()
+        try:
+            while (result := await loop.run_in_executor(None, self.get)) is not None:
+                yield result
+        finally:
+            await loop.run_in_executor(None, self.close)
+
+
+    def __enter__(self) -> 'ResultStream':
+        return self.start()
+
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+    def _produce(self) -> None:
+        iterator = iter(self.source)
+        try:
+            for result in iterator:
+                with self._cond:
+                    if self.drop_policy == 'block':
+                        self._cond.wait_for(lambda: len(self._buffer) < self.max_buffer or self._closed)
+                    if self._closed:
+                        break
+                    if len(self._buffer) >= self.max_buffer:
+                        self.dropped += 1
+                        if self.drop_policy == 'drop_newest':
+                            continue
+                        self._buffer.popleft()
+                    self._buffer.append(result)
+                    self._cond.notify_all()
+        except BaseException as e:
+            self._error = e
+        finally:
+            if hasattr(iterator, 'close'):
+                iterator.close()
+            with self._cond:
+                self._finished = True
+                self._cond.notify_all()
+
+
+def open_stream(cpu: bool = False,
+                gate: bool = False,
+                mosaic: bool = False,
+                source: str | int = CpuBackend.SOURCE,
+                threads: int = CpuBackend.INFERENCE_THREADS,
+                max_buffer: int = Results.MAX_BUFFER,
+                drop_policy: str = Results.DROP_POLICY,
+                logger: Logger.Logger | None = None,
+                record: Path | None = None) -> ResultStream:
+    """Library entry point, stream of :class:`FrameResult` from the device or the host CPU backend
+
+    Examples
+    --------
+    >>> for result in open_stream(gate=True):
+    ...     print(result.sequence_num, result.texts)
+
+    >>> async for result in open_stream(drop_policy='drop_oldest'):
+    ...     await publish(result)
+    """
+    if cpu and (gate or mosaic or record is not None):
+        raise ValueError('gate, mosaic and record apply to the device pipeline only, not to the CPU backend')
+    if cpu:
+        results = read_cpu(source, threads)
+    else:
+        results = read_device(FrameGate() if gate else None, CropMosaic(Mosaic.BATCH_SIZE) if mosaic else None, logger, record)
+    return ResultStream(results, max_buffer, drop_policy)
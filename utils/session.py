@@ -0,0 +1,171 @@
+"""Supervised device connection which survives XLink drops without rebuilding the pipeline"""
+import time
+from typing import Any, Callable, Iterable, Iterator
+
+import depthai as dai
+
+from utils.settings import Session, Sync
+import utils.Logger as Logger
+
+
+class Queues:
+    """Host side queues of the pipeline built by ``create_pipeline``
+
+    Parameters
+    ----------
+    device : dai.Device
+        Connected device
+    gating : bool
+        Pipeline was built with a gate (``'gate_hist'`` stream)
+    mosaic : bool
+        Pipeline was built with a batch recognition network (``'recnn_batch_*'`` streams)
+    """
+    def __init__(self, device: dai.Device, gating: bool = False, mosaic: bool = False) -> None:
+        self.cam_ctrl: dai.DataInputQueue  = device.getInputQueue('cam_ctrl', 1, blocking=False)
+        self.manip_img: dai.DataInputQueue = device.getInputQueue('manip_img', 4, blocking=False)
+        self.manip_cfg: dai.DataInputQueue = device.getInputQueue('manip_cfg', 4, blocking=False)
+
+        self.detnn_out: dai.DataOutputQueue  = device.getOutputQueue('detnn_out', Sync.QUEUE_SIZE, blocking=False)
+        self.detnn_pass: dai.DataOutputQueue = device.getOutputQueue('detnn_pass', Sync.QUEUE_SIZE, blocking=False)
+        self.manip_out: dai.DataOutputQueue  = device.getOutputQueue('manip_out', 1, blocking=False)
+        self.recnn_out: dai.DataOutputQueue  = device.getOutputQueue('recnn_out', 8, blocking=False)
+
+        self.gate_hist: dai.DataInputQueue | None = device.getInputQueue('gate_hist', 4, blocking=False) if gating else None
+        self.recnn_batch_in: dai.DataInputQueue | None = device.getInputQueue('recnn_batch_in', 2, blocking=True) if mosaic else None
+        self.recnn_batch_out: dai.DataOutputQueue | None = device.getOutputQueue('recnn_batch_out', 2, blocking=True) if mosaic else None
+
+
+class DeviceSession:
+    """Keeps a built pipeline running across device disconnects
+
+    The pipeline is built once by the caller. On a device error the connection
+    is closed and reopened with bounded exponential backoff, queues are
+    recreated with ``open_queues`` and ``step`` is resumed, so any state kept by
+    the caller survives the reconnect.
+
+    Parameters
+    ----------
+    pipeline : dai.Pipeline
+        Built pipeline, reused for every connection
+    open_queues : Callable[[dai.Device], Any]
+        Creates the host queues (and sends any initial control) on a fresh connection
+    device_factory : Callable[[dai.Pipeline], dai.Device]
+        Opens a device running ``pipeline``, replaceable for testing
+    errors : tuple[type[BaseException], ...]
+        Exceptions that may mean a lost connection. One of them only triggers a
+        reconnect if the device could not be opened, reports itself closed, or
+        the message matches ``Session.DEVICE_ERROR_PATTERNS``; anything else
+        (e.g. a bug in ``step``) is re-raised.
+    initial_backoff, max_backoff : float
+        First and longest wait between reconnect attempts in seconds
+    max_reconnects : int | None
+        Give up (re-raise) after this many consecutive failed attempts, ``None`` retries forever
+    logger : Logger.Logger | None
+        Where to report disconnects
+    """
+    def __init__(self,
+                 pipeline: dai.Pipeline,
+                 open_queues: Callable[[dai.Device], Any],
+                 device_factory: Callable[[dai.Pipeline], dai.Device] = dai.Device,
+                 errors: tuple[type[BaseException], ...] = (RuntimeError,),
+                 initial_backoff: float = Session.INITIAL_BACKOFF,
+                 max_backoff: float = Session.MAX_BACKOFF,
+                 max_reconnects: int | None = Session.MAX_RECONNECTS,
+                 logger: Logger.Logger | None = None,
+                 sleep: Callable[[float], None] = time.sleep) -> None:
+        self.pipeline: dai.Pipeline = pipeline
+        self.open_queues: Callable[[dai.Device], Any] = open_queues
+        self.device_factory: Callable[[dai.Pipeline], dai.Device] = device_factory
+        self.errors: tuple[type[BaseException], ...] = errors
+        self.initial_backoff: float = initial_backoff
+        self.max_backoff: float = max_backoff
+        self.max_reconnects: int | None = max_reconnects
+        self.logger: Logger.Logger = logger if logger is not None else Logger.Logger(False)
+        self._sleep: Callable[[float], None] = sleep
+
+        self.device: dai.Device | None = None
+        self.queues: Any = None
+        self.connections: int = 0       # successful connections, the first one included
+        self.reconnects: int = 0        # reconnect attempts after device errors
+
+
+    def connect(self) -> Any:
+        """Opens the device and queues, returns the queues
+
+        If opening the queues fails the device stays open, :meth:`close` it.
+        """
+        self.device = self.device_factory(self.pipeline)
+        self.queues = self.open_queues(self.device)
+        self.connections += 1
+        return self.queues
+
+
+    def is_device_error(self, e: BaseException) -> bool:
+        """Whether ``e`` (one of ``errors``) means the connection to the device is lost"""
+        if self.device is None:
+            return True     # the device could not be opened
+        try:
+            if self.device.isClosed():
+                return True
+        except Exception:
+            return True
+        message = str(e).lower()
+        return any(pattern in message for pattern in Session.DEVICE_ERROR_PATTERNS)
+
+
+    def close(self) -> None:
+        """Closes the device, errors of an already broken connection are ignored"""
+        if self.device is None:
+            return
+        try:
+            self.device.close()
+        except self.errors:
+            pass
+        finally:
+            self.device = None
+            self.queues = None
+
+
+    def run(self, step: Callable[[Any], bool]) -> None:
+        """Calls ``step(queues)`` until it returns ``False``, reconnecting on device errors"""
+        supervised = self._supervise(step)
+        try:
+            for keep_going in supervised:
+                if not keep_going:
+                    return
+        finally:
+            supervised.close()
+
+
+    def stream(self, step: Callable[[Any], Iterable]) -> Iterator:
+        """Yields everything ``step(queues)`` returns, reconnecting on device errors, until closed"""
+        for items in self._supervise(step):
+            yield from items
+
+
+    def _supervise(self, step: Callable[[Any], Any]) -> Iterator:
+        failures: int = 0
+        backoff: float = self.initial_backoff
+
+        try:
+            while True:
+                try:
+                    queues = self.connect()
+                    while True:
+                        result = step(queues)
+                        failures, backoff = 0, self.initial_backoff
+                        yield result
+                except self.errors as e:
+                    device_error = self.is_device_error(e)
+                    self.close()
+                    if not device_error:
+                        raise
+                    failures += 1
+                    if self.max_reconnects is not None and failures > self.max_reconnects:
+                        raise
+                    self.reconnects += 1
+                    self.logger(f'Device error: {e}\nReconnecting in {backoff:.1f} s (attempt {failures})')
+                    self._sleep(backoff)
+                    backoff = min(backoff * 2, self.max_backoff)
+        finally:
+            self.close()
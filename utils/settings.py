@@ -2,7 +2,7 @@ import depthai as dai
 import numpy as np
 from pathlib import Path
 
-__all__ = ['PathLibrary', 'BlobPaths', 'Lens', 'Device']
+__all__ = ['PathLibrary', 'BlobPaths', 'Lens', 'Device', 'Gating', 'Mosaic', 'CpuBackend', 'Sync', 'Session', 'Results', 'Regression']
 
 #-------------------------------------------------------------------------------------------------------------------------------
 # Class containing useful paths in this project
@@ -15,6 +15,10 @@ class PathLibrary:
 
 	class RecognitionNetwork:
 		_TEXT_RECOGNITION_0012: Path = (Path('.') / 'models' / 'text-recognition-0012_openvino_2021.2_6shave.blob').absolute()
+
+	class CpuModels:
+		_EAST_DETECTION: Path = (Path('.') / 'models' / 'east_text_detection_256x256.onnx').absolute()
+		_TEXT_RECOGNITION_0012: Path = (Path('.') / 'models' / 'text-recognition-0012.xml').absolute()
 	
  
 #-------------------------------------------------------------------------------------------------------------------------------
@@ -56,3 +60,81 @@ class Device:
 
 Device._calculate_vid_prev_ratio_x()
 Device._calculate_vid_prev_ratio_y()
+
+
+#-------------------------------------------------------------------------------------------------------------------------------
+# Class with frame gating settings (see utils/gating.py)
+#-------------------------------------------------------------------------------------------------------------------------------
+class Gating:
+	MOTION_THRESHOLD: float = 4.0 # mean absolute difference of subsampled pixels (0-255) counted as motion
+	MIN_FPS: float = 0.5 # > 0, frames are still detected at this rate when the scene is idle
+	HOLD_FRAMES: int = 5 # number of detected frames to keep full rate for after the last detection
+	SUBSAMPLE_STEP: int = 16 # every n-th pixel in both directions is used for the difference
+
+
+#-------------------------------------------------------------------------------------------------------------------------------
+# Class with host-side crop mosaic settings (see utils/mosaic.py)
+#-------------------------------------------------------------------------------------------------------------------------------
+class Mosaic:
+	BATCH_SIZE: int = 8 # must match the batch the recognition blob was compiled for
+	CROP_SIZE: tuple[int, int] = (120, 32) # recognition network input (width, height)
+	CHANNELS: int = 1 # recognition network input channels, text-recognition-0012 reads grayscale [N, 1, 32, 120]
+
+
+#-------------------------------------------------------------------------------------------------------------------------------
+# Class with host CPU backend settings (see utils/cpu_backend.py)
+#-------------------------------------------------------------------------------------------------------------------------------
+class CpuBackend:
+	DETECTION_MODEL: Path = PathLibrary.CpuModels._EAST_DETECTION # OpenVINO IR (.xml, needs the openvino package) or any format cv2.dnn.readNet accepts
+	RECOGNITION_MODEL: Path = PathLibrary.CpuModels._TEXT_RECOGNITION_0012 # OpenVINO IR (.xml) as downloaded from the Open Model Zoo, other formats are rejected
+	EAST_SCORES_OUTPUT: str = 'sigmoid' # part of the name of the EAST score map output
+	SOURCE: str = '0' # camera index (V4L2/USB) or path to a video file
+	INFERENCE_THREADS: int = 2 # > 0, frames processed concurrently, each thread loads its own networks running on cores / INFERENCE_THREADS threads
+	BATCH_SIZE: int = 8 # > 0, crops recognised in one forward pass
+	DETECTION_INPUT_SIZE: tuple[int, int] = (256, 256) # same as Device.PREVIEW_SIZE
+	DETECTION_MEAN: tuple[float, float, float] = (123.68, 116.78, 103.94) # subtracted from the EAST input (RGB order after DETECTION_SWAP_RB), the device blob has it compiled in
+	DETECTION_SWAP_RB: bool = True # EAST expects RGB, frames are BGR
+
+
+#-------------------------------------------------------------------------------------------------------------------------------
+# Class with host side detection/frame pairing settings (see utils/sync.py)
+#-------------------------------------------------------------------------------------------------------------------------------
+class Sync:
+	CAPACITY: int = 8 # > 0, messages waiting for a pair on each side
+	TOLERANCE: int = 0 # >= 0, allowed difference of sequence numbers of a pair
+	QUEUE_SIZE: int = 4 # depth of the detection output and passthrough queues
+
+
+#-------------------------------------------------------------------------------------------------------------------------------
+# Class with device reconnect settings (see utils/session.py)
+#-------------------------------------------------------------------------------------------------------------------------------
+class Session:
+	INITIAL_BACKOFF: float = 0.5 # seconds before the first reconnect attempt
+	MAX_BACKOFF: float = 8.0 # >= INITIAL_BACKOFF, backoff doubles up to this value
+	MAX_RECONNECTS: int | None = None # consecutive failed attempts before giving up, None = never
+	DEVICE_ERROR_PATTERNS: tuple[str, ...] = ('x_link', 'xlink', 'communication exception', 'device error') # lowercase parts of messages of lost connections
+
+
+#-------------------------------------------------------------------------------------------------------------------------------
+# Class with result streaming settings (see utils/results.py)
+#-------------------------------------------------------------------------------------------------------------------------------
+class Results:
+	MAX_BUFFER: int = 16 # > 0, results waiting for a slow consumer
+	DROP_POLICY: str = 'drop_oldest' # 'block', 'drop_oldest' or 'drop_newest'
+	RECOGNITION_TIMEOUT: float = 0.5 # seconds to wait for recognition of all boxes of a frame (or a mosaic batch) before the frame is reported as failed
+	POLL_INTERVAL: float = 0.005 # seconds between polls of empty queues
+	CLOSE_TIMEOUT: float = 5.0 # seconds to wait for the producer thread when closing a stream
+
+
+#-------------------------------------------------------------------------------------------------------------------------------
+# Class with regression harness settings (see utils/harness.py and regression.py)
+#-------------------------------------------------------------------------------------------------------------------------------
+class Regression:
+	CORPUS: Path = (Path('.') / 'corpus' / 'v1').absolute()
+	BASELINE: Path = (Path('.') / 'corpus' / 'v1' / 'baseline.json').absolute()
+	BATCH_SIZE: int = Mosaic.BATCH_SIZE
+	REPEAT: int = 3 # > 0, passes over the corpus, more passes give steadier throughput numbers
+	MIN_CHAR_ACCURACY: float = 0.0 # absolute thresholds, 0 disables them
+	MIN_WORD_ACCURACY: float = 0.0
+	ACCURACY_TOLERANCE: float = 0.0 # allowed absolute drop of accuracy against the baseline
+	THROUGHPUT_TOLERANCE: float = 0.15 # allowed relative drop of fps, crops/s and rise of latency against a baseline from the same host
@@ -0,0 +1,123 @@
+"""Host side pairing of detection results with their passthrough frames by sequence number"""
+from typing import Any
+from utils.settings import Sync
+
+
+class SequenceMatcher:
+    """Small bounded reorder buffer pairing two in-order streams by ``getSequenceNum()``
+
+    A detection and a frame are paired when their sequence numbers differ by at
+    most ``tolerance``. Messages that can no longer be paired (the other stream
+    has already moved past them) or that overflow the buffer are dropped and
+    counted in ``unmatched_detections`` / ``unmatched_frames``.
+
+    Parameters
+    ----------
+    capacity : int
+        Maximum number of messages waiting for a pair on each side
+    tolerance : int
+        Maximum difference of sequence numbers of a pair
+    """
+    def __init__(self, capacity: int = Sync.CAPACITY, tolerance: int = Sync.TOLERANCE) -> None:
+        if capacity < 1:
+            raise ValueError(f'capacity must be positive, got {capacity}')
+        self.capacity: int = capacity
+        self.tolerance: int = tolerance
+
+        self._detections: dict[int, Any] = {}
+        self._frames: dict[int, Any] = {}
+        self._last_detection: int | None = None     # highest sequence number seen on each side
+        self._last_frame: int | None = None
+
+        self.matched: int = 0
+        self.unmatched_detections: int = 0
+        self.unmatched_frames: int = 0
+
+
+    def add_detection(self, detection: Any) -> tuple[Any, Any] | None:
+        """Adds a detection output, returns ``(detection, frame)`` if it completes a pair"""
+        seq = detection.getSequenceNum()
+        self._last_detection = seq if self._last_detection is None else max(self._last_detection, seq)
+        pair = self._match(seq, self._frames)
+        if pair is not None:
+            result = (detection, pair)
+        else:
+            self._detections[seq] = detection
+            result = None
+        self._evict()
+        return result
+
+
+    def add_frame(self, frame: Any) -> tuple[Any, Any] | None:
+        """Adds a passthrough frame, returns ``(detection, frame)`` if it completes a pair"""
+        seq = frame.getSequenceNum()
+        self._last_frame = seq if self._last_frame is None else max(self._last_frame, seq)
+        pair = self._match(seq, self._detections)
+        if pair is not None:
+            result = (pair, frame)
+        else:
+            self._frames[seq] = frame
+            result = None
+        self._evict()
+        return result
+
+
+    def poll(self, q_detections, q_frames) -> list[tuple[Any, Any]]:
+        """Drains both queues without blocking and returns all completed pairs in order"""
+        pairs: list[tuple[Any, Any]] = []
+        for detection in q_detections.tryGetAll():
+            pair = self.add_detection(detection)
+            if pair is not None:
+                pairs.append(pair)
+        for frame in q_frames.tryGetAll():
+            pair = self.add_frame(frame)
+            if pair is not None:
+                pairs.append(pair)
+        pairs.sort(key=lambda pair: pair[0].getSequenceNum())
+        return pairs
+
+
+    def reset(self) -> None:
+        """Drops waiting messages (as unmatched) and forgets sequence numbers, e.g. after a reconnect"""
+        self.unmatched_detections += len(self._detections)
+        self.unmatched_frames += len(self._frames)
+        self._detections.clear()
+        self._frames.clear()
+        self._last_detection = None
+        self._last_frame = None
+
+
+    @property
+    def pending(self) -> int:
+        """Number of messages waiting for a pair"""
+        return len(self._detections) + len(self._frames)
+
+
+    def _match(self, seq: int, candidates: dict[int, Any]) -> Any | None:
+        best = None
+        for other in candidates:
+            if abs(other - seq) <= self.tolerance and (best is None or abs(other - seq) < abs(best - seq)):
+                best = other
+        if best is None:
+            return None
+        self.matched += 1
+        return candidates.pop(best)
+
+
+    def _evict(self) -> None:
+        # streams are in order, so nothing newer than the other side's last message can pair with older entries
+        if self._last_frame is not None:
+            for seq in [s for s in self._detections if s + self.tolerance < self._last_frame]:
+                del self._detections[seq]
+                self.unmatched_detections += 1
+        if self._last_detection is not None:
+            for seq in [s for s in self._frames if s + self.tolerance < self._last_detection]:
+                del self._frames[seq]
+                self.unmatched_frames += 1
+
+        while len(self._detections) > self.capacity:
+            del self._detections[min(self._detections)]
+            self.unmatched_detections += 1
+        while len(self._frames) > self.capacity:
+            del self._frames[min(self._frames)]
+            self.unmatched_frames += 1